@@ -9,8 +9,12 @@ db.users.createIndex({ user_uuid: 1 }, { unique: true });
 
 db.courses.createIndex({ title: "text", category: "text" });
 db.courses.createIndex({ course_uuid: 1 }, { unique: true });
+db.courses.createIndex({ title: 1 });
+db.courses.createIndex({ category: 1, title: 1 });
 
-db.lessons.createIndex({ title: "text", course_title: 1 });
+db.lessons.createIndex({ title: "text" });
+db.lessons.createIndex({ course_title: 1 });
+db.lessons.createIndex({ url_grams: 1 });
 
 db.enrollments.createIndex({ user_email: 1, course_title: 1 }, { unique: true });
 
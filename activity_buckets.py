@@ -0,0 +1,216 @@
+import time
+import heapq
+import zlib
+import argparse
+from datetime import datetime
+from itertools import islice
+
+from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent
+
+from connect import connect_mongo, connect_cassandra
+
+#################################################################
+# COURSE_ACTIVITY EN BUCKETS (PARTICIONES (course_title, bucket))
+#################################################################
+# `course_activity` tiene una partición por curso: en un curso masivo todos
+# sus alumnos caen en una sola partición sin límite. La tabla
+# `course_activity_by_bucket` reparte cada curso en ACTIVITY_BUCKETS
+# particiones según un hash estable del email. Las lecturas usan los buckets
+# cuando `meta.activity_layout` lo indica y consultan todos los buckets a la
+# vez, mezclando las filas en el orden de clustering.
+#
+# Corte (cut-over):
+#   1. Mientras el layout no está activo, los escritores llenan ambas tablas y
+#      la migración de este módulo copia lo anterior (--verify compara).
+#   2. --enable activa el layout. Al reiniciar, cada proceso lee los buckets y
+#      deja de escribir course_activity (inscripción, calificaciones, cargas y
+#      reconciliación de contadores usan solo los buckets).
+#   3. Desde ese momento course_activity queda congelada: ya no se migra ni se
+#      verifica contra ella, y --disable la volvería a leer desactualizada. Se
+#      puede borrar (DROP TABLE) cuando ya no haga falta volver atrás.
+#
+# Cambiar ACTIVITY_BUCKETS requiere volver a migrar: el bucket de cada fila
+# depende de ese número.
+
+ACTIVITY_BUCKETS = 16
+MIGRATION_FETCH_SIZE = 5000
+
+_bucketed_reads = False
+
+
+def activity_bucket(email, buckets=ACTIVITY_BUCKETS):
+    """ Bucket de un alumno. crc32 (y no hash()) para que sea el mismo en todos los procesos. """
+    return zlib.crc32(email.strip().lower().encode("utf-8")) % buckets
+
+
+def load_layout(mongo):
+    """ Lee `meta.activity_layout` y activa las lecturas por bucket si la migración ya terminó. """
+    global _bucketed_reads
+    doc = mongo.meta.find_one({"_id": "activity_layout"}) or {}
+    if doc.get("bucketed") and doc.get("buckets") != ACTIVITY_BUCKETS:
+        print(f"ADVERTENCIA: course_activity_by_bucket se migró con {doc.get('buckets')} buckets "
+              f"(el código usa {ACTIVITY_BUCKETS}); se leerá course_activity.")
+        _bucketed_reads = False
+    else:
+        _bucketed_reads = bool(doc.get("bucketed"))
+    return _bucketed_reads
+
+
+def set_layout(mongo, bucketed):
+    """ Activa/desactiva las lecturas por bucket para todos los procesos (al reiniciar). """
+    global _bucketed_reads
+    mongo.meta.update_one({"_id": "activity_layout"},
+                          {"$set": {"bucketed": bool(bucketed), "buckets": ACTIVITY_BUCKETS, "updated_at": datetime.now()}},
+                          upsert=True)
+    _bucketed_reads = bool(bucketed)
+
+
+def is_bucketed():
+    return _bucketed_reads
+
+
+def writes_legacy():
+    """ True mientras course_activity siga siendo la tabla de lectura y haya que mantenerla al día. """
+    return not _bucketed_reads
+
+
+#################################################################
+# LECTOR FAN-OUT
+#################################################################
+
+def activity_order(row):
+    """ Orden de clustering dentro de un estado: (grade, email). """
+    return (row.grade, row.email)
+
+
+def merge_bucket_rows(pages):
+    """ Mezcla las filas (ya ordenadas) de cada bucket en una sola lista ordenada. """
+    return list(heapq.merge(*pages, key=activity_order))
+
+
+def fan_out(cass, name, course_title, params=(), buckets=ACTIVITY_BUCKETS):
+    """ Lanza `name` sobre todos los buckets del curso a la vez; regresa la lista de filas por bucket. """
+    futures = [cass.run_async(name, (course_title, bucket) + tuple(params)) for bucket in range(buckets)]
+    # Iterar el ResultSet trae las páginas restantes de cada bucket; las primeras ya llegaron en paralelo.
+    return [list(future.result()) for future in futures]
+
+
+def _paged_rows(future):
+    """ Filas de un ResponseFuture paginado; iterar el ResultSet pide las páginas siguientes al consumirlas. """
+    yield from future.result()
+
+
+def iter_bucketed(cass, name, course_title, params=(), fetch_size=100, buckets=ACTIVITY_BUCKETS):
+    """ Versión en streaming de fan_out + merge: cada bucket se pagina por separado y se mezclan al vuelo.
+
+    La primera página de todos los buckets se pide a la vez (como fan_out); las
+    siguientes, solo cuando el merge llega al final de la anterior.
+    """
+    futures = [cass.run_async(name, (course_title, bucket) + tuple(params), fetch_size=fetch_size) for bucket in range(buckets)]
+    return heapq.merge(*(_paged_rows(future) for future in futures), key=activity_order)
+
+
+def bucketed_activity(cass, course_title, status):
+    return merge_bucket_rows(fan_out(cass, "activity_bucket_by_status", course_title, (status,)))
+
+
+def bucketed_below_grade(cass, course_title, status, threshold):
+    return merge_bucket_rows(fan_out(cass, "activity_bucket_below_grade", course_title, (status, threshold)))
+
+
+def bucketed_count(cass, course_title, status):
+    return sum(rows[0][0] for rows in fan_out(cass, "activity_bucket_count", course_title, (status,)) if rows)
+
+
+#################################################################
+# MIGRACIÓN course_activity -> course_activity_by_bucket
+#################################################################
+
+def _copy_statements(session, insert, fetch_size):
+    scan = SimpleStatement("SELECT course_title, status, grade, email, name, course_id, user_id FROM course_activity",
+                           fetch_size=fetch_size)
+    for r in session.execute(scan):
+        yield insert, (r.course_title, activity_bucket(r.email), r.status, r.grade, r.email, r.name, r.course_id, r.user_id)
+
+
+def migrate(session, concurrency=100, fetch_size=MIGRATION_FETCH_SIZE, chunk_size=20000):
+    """ Copia cada fila de course_activity a su bucket. Es idempotente (los INSERT son upserts).
+
+    Las escrituras nuevas ya llegan a ambas tablas, así que se puede correr con
+    la aplicación en línea; regresa (copiadas, errores).
+    """
+    insert = session.prepare("INSERT INTO course_activity_by_bucket (course_title, bucket, status, grade, email, name, course_id, user_id) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+    rows = errors = 0
+    started = time.perf_counter()
+    statements = _copy_statements(session, insert, fetch_size)
+    # Por bloques, como bulk_load._run_concurrent, para no materializar la tabla completa.
+    while chunk := list(islice(statements, chunk_size)):
+        for ok, _ in execute_concurrent(session, chunk, concurrency=concurrency, raise_on_first_error=False):
+            if ok: rows += 1
+            else: errors += 1
+        elapsed = time.perf_counter() - started
+        print(f"  {rows} filas copiadas ({rows / elapsed:,.0f} filas/s), {errors} errores")
+    return rows, errors
+
+
+def verify(session, statuses=("active", "completed")):
+    """ Compara, por curso y estado, el conteo de course_activity contra la suma de sus buckets. """
+    count_old = session.prepare("SELECT COUNT(*) FROM course_activity WHERE course_title=? AND status=?")
+    count_new = session.prepare("SELECT COUNT(*) FROM course_activity_by_bucket WHERE course_title=? AND bucket=? AND status=?")
+    titles = {r.course_title for r in session.execute(SimpleStatement("SELECT DISTINCT course_title FROM course_activity",
+                                                                       fetch_size=MIGRATION_FETCH_SIZE))}
+    mismatches = []
+    for title in sorted(titles):
+        for status in statuses:
+            expected = session.execute(count_old, (title, status)).one()[0]
+            futures = [session.execute_async(count_new, (title, b, status)) for b in range(ACTIVITY_BUCKETS)]
+            actual = sum(f.result().one()[0] for f in futures)
+            if expected != actual:
+                mismatches.append((title, status, expected, actual))
+    return len(titles), mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra course_activity a course_activity_by_bucket y controla qué tabla se lee.")
+    parser.add_argument("--concurrency", type=int, default=100, help="Inserts simultáneos en Cassandra")
+    parser.add_argument("--fetch-size", type=int, default=MIGRATION_FETCH_SIZE, help="Filas por página al recorrer course_activity")
+    parser.add_argument("--skip-copy", action="store_true", help="No copiar; solo verificar y/o cambiar el layout")
+    parser.add_argument("--verify", action="store_true", help="Comparar conteos por curso y estado después de copiar")
+    parser.add_argument("--enable", action="store_true", help="Activar las lecturas por bucket si la copia no tuvo errores")
+    parser.add_argument("--disable", action="store_true", help="Volver a leer course_activity")
+    args = parser.parse_args()
+
+    mongo = connect_mongo()
+    session = connect_cassandra()
+
+    errors = 0
+    if load_layout(mongo) and (args.verify or not args.skip_copy):
+        # Después del corte course_activity ya no recibe escrituras: copiarla pisaría los buckets.
+        print("El layout por buckets ya está activo: course_activity está congelada; no se copia ni se verifica.")
+        args.skip_copy, args.verify = True, False
+    if not args.skip_copy:
+        print(f"Copiando course_activity a {ACTIVITY_BUCKETS} buckets por curso...")
+        copied, errors = migrate(session, args.concurrency, args.fetch_size)
+        print(f"Copia terminada: {copied} filas, {errors} errores.")
+
+    if args.verify:
+        courses, mismatches = verify(session)
+        print(f"Verificados {courses} cursos: {len(mismatches)} diferencias.")
+        for title, status, expected, actual in mismatches[:20]:
+            print(f"  {title} [{status}]: course_activity={expected} buckets={actual}")
+        errors += len(mismatches)
+
+    if args.disable:
+        if is_bucketed():
+            print("ADVERTENCIA: course_activity no recibió escrituras desde el corte; estará desactualizada "
+                  "hasta volver a copiarla desde los buckets.")
+        set_layout(mongo, False)
+        print("Lecturas desde course_activity (reiniciar los procesos para aplicar).")
+    elif args.enable:
+        if errors:
+            print("No se activan las lecturas por bucket: hubo errores o diferencias.")
+        else:
+            set_layout(mongo, True)
+            print("Lecturas por bucket activadas (reiniciar los procesos para aplicar).")
@@ -0,0 +1,253 @@
+import os
+import time
+import argparse
+import threading
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from cassandra.concurrent import execute_concurrent
+
+from connect import connect_cassandra
+
+#################################################################
+# ARCHIVO DE LOGS DE SESIÓN EN PARQUET
+#################################################################
+# Los eventos de login/logout con más de N días se copian de Cassandra a
+# archivos Parquet (zstd) particionados por día (data/archive/logs/day=...),
+# y después se borran de las tablas calientes con borrados por rango:
+#   - logs_by_user:      se recorre en paralelo por rangos de token (tiene
+#                        todas las columnas y todo el histórico) y se borra
+#                        con DELETE ... WHERE email=? AND action=? AND action_date < ?
+#   - user_events:       DELETE ... WHERE email=? AND action_date < ?
+#   - logs_by_role_day:  particiones (role, day) completas de días archivados.
+# Cada rango de token escribe sus archivos, luego borra las particiones
+# (role, day) que encontró y al final sus filas de logs_by_user/user_events;
+# si algo falla antes de ese último paso las filas siguen en logs_by_user y
+# basta con volver a correrlo (los borrados de particiones son idempotentes). Los nombres de
+# archivo son deterministas (fecha de corte, rango, lote): una segunda corrida
+# con el mismo corte sobrescribe los mismos archivos en lugar de duplicarlos.
+# Si aun así una fila queda en dos archivos (p. ej. corridas con --keep en
+# días distintos), archived_logs la regresa una sola vez.
+#
+# Las consultas de auditoría leen el archivo con pyarrow.dataset: el filtro
+# por día descarta directorios completos y los demás predicados se empujan a
+# las estadísticas de row groups de Parquet.
+
+ARCHIVE_DIR = "data/archive/logs"
+ARCHIVE_DAYS = 90               # Se archivan los eventos con más de N días
+ARCHIVE_SPLITS = 64             # Rangos de token en que se divide el anillo
+ARCHIVE_WORKERS = 8             # Rangos recorridos a la vez
+ARCHIVE_FETCH_SIZE = 5000
+ARCHIVE_BATCH_ROWS = 100000     # Filas por archivo Parquet (por rango)
+ARCHIVE_COMPRESSION = "zstd"
+
+MIN_TOKEN = -(2 ** 63)
+MAX_TOKEN = 2 ** 63 - 1
+
+LOG_SCHEMA = pa.schema([
+    ("email", pa.string()),
+    ("action", pa.string()),
+    ("action_date", pa.timestamp("ms")),
+    ("role", pa.string()),
+    ("name", pa.string()),
+    ("user_id", pa.string()),
+    ("day", pa.string()),
+])
+DAY_PARTITIONING = ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+
+
+def token_ranges(splits=ARCHIVE_SPLITS):
+    """ Divide el anillo Murmur3 en `splits` rangos (inicio, fin] contiguos. """
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + i * step for i in range(splits)] + [MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def cutoff_for(days, today=None):
+    """ Medianoche de hace `days` días: se archiva todo lo anterior (días completos). """
+    return datetime.combine((today or date.today()) - timedelta(days=days), datetime.min.time())
+
+
+#################################################################
+# EXPORTACIÓN + BORRADO
+#################################################################
+
+class LogArchiver:
+    def __init__(self, session, root=ARCHIVE_DIR, cutoff=None, delete=True, fetch_size=ARCHIVE_FETCH_SIZE,
+                 batch_rows=ARCHIVE_BATCH_ROWS):
+        self.session = session
+        self.root = root
+        self.cutoff = cutoff or cutoff_for(ARCHIVE_DAYS)
+        self.delete = delete
+        self.fetch_size = fetch_size
+        self.batch_rows = batch_rows
+        self.file_prefix = f"logs-{self.cutoff:%Y%m%d}"
+        self.scanned = 0
+        self.archived = 0
+        self.deleted = 0
+        self.errors = 0
+        self.role_days = set()     # Particiones (role, day) ya borradas en esta corrida
+        self._lock = threading.Lock()
+        self.q_scan = session.prepare("SELECT email, action, action_date, role, name, user_id FROM logs_by_user "
+                                      "WHERE token(email) > ? AND token(email) <= ?")
+        self.q_delete_user = session.prepare("DELETE FROM logs_by_user WHERE email=? AND action=? AND action_date < ?")
+        self.q_delete_events = session.prepare("DELETE FROM user_events WHERE email=? AND action_date < ?")
+        self.q_delete_role_day = session.prepare("DELETE FROM logs_by_role_day WHERE role=? AND day=?")
+
+    def _write(self, rows, range_idx, batch_idx):
+        table = pa.Table.from_pylist(rows, schema=LOG_SCHEMA)
+        ds.write_dataset(table, self.root, format="parquet", partitioning=DAY_PARTITIONING,
+                         basename_template=f"{self.file_prefix}-{range_idx:04d}-{batch_idx:04d}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore",
+                         file_options=ds.ParquetFileFormat().make_write_options(compression=ARCHIVE_COMPRESSION))
+
+    def _delete(self, keys):
+        """ Borrados por rango de las filas ya archivadas de un rango de token. Regresa errores. """
+        statements = [(self.q_delete_user, (email, action, self.cutoff)) for email, action in keys]
+        statements += [(self.q_delete_events, (email, self.cutoff)) for email in {email for email, _ in keys}]
+        results = execute_concurrent(self.session, statements, concurrency=50, raise_on_first_error=False)
+        return sum(1 for ok, _ in results if not ok)
+
+    def archive_range(self, range_idx, start, end):
+        statement = self.q_scan.bind((start, end))
+        statement.fetch_size = self.fetch_size
+        rows, keys, role_days = [], set(), set()
+        scanned = archived = batch_idx = 0
+        for r in self.session.execute(statement):
+            scanned += 1
+            if r.action_date >= self.cutoff:
+                continue
+            day = r.action_date.date().isoformat()
+            rows.append({"email": r.email, "action": r.action, "action_date": r.action_date, "role": r.role,
+                         "name": r.name, "user_id": str(r.user_id) if r.user_id else None, "day": day})
+            keys.add((r.email, r.action))
+            if r.role:      # role es llave de partición en logs_by_role_day: sin rol no hay partición
+                role_days.add((r.role, r.action_date.date()))
+            if len(rows) >= self.batch_rows:
+                self._write(rows, range_idx, batch_idx)
+                archived += len(rows)
+                rows, batch_idx = [], batch_idx + 1
+        if rows:
+            self._write(rows, range_idx, batch_idx)
+            archived += len(rows)
+
+        errors = deleted = 0
+        if self.delete and keys:
+            # Primero las particiones (role, day): si fallan, las filas siguen en
+            # logs_by_user y la siguiente corrida las vuelve a encontrar.
+            errors = self.drop_role_days(role_days)
+            if not errors:
+                errors = self._delete(keys)
+                deleted = len(keys)
+        with self._lock:
+            self.scanned += scanned
+            self.archived += archived
+            self.deleted += deleted
+            self.errors += errors
+
+    def drop_role_days(self, role_days):
+        """ Borra las particiones (role, day) de logs_by_role_day que aún no se borraron en esta corrida. Regresa errores. """
+        with self._lock:
+            pending = sorted(role_days - self.role_days)
+            self.role_days |= set(pending)
+        statements = [(self.q_delete_role_day, key) for key in pending]
+        failed = [key for (ok, _), key in zip(execute_concurrent(self.session, statements, concurrency=50,
+                                                                 raise_on_first_error=False), pending) if not ok]
+        if failed:
+            with self._lock:
+                self.role_days -= set(failed)
+        return len(failed)
+
+    def run(self, splits=ARCHIVE_SPLITS, workers=ARCHIVE_WORKERS):
+        started = time.perf_counter()
+        ranges = token_ranges(splits)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archivo") as pool:
+            futures = [pool.submit(self.archive_range, i, start, end) for i, (start, end) in enumerate(ranges)]
+            for done, future in enumerate(futures, 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"ERROR en rango de token: {e}")
+                    self.errors += 1
+                print(f"  rangos {done}/{len(ranges)} | leídas={self.scanned} archivadas={self.archived}", end="\r")
+        print()
+        elapsed = time.perf_counter() - started
+        print(f"{self.archived} eventos archivados en {elapsed:.1f} s ({self.archived / max(elapsed, 1e-9):,.0f} filas/s), "
+              f"{self.deleted} rangos borrados, {self.errors} errores")
+        return self.errors == 0
+
+
+def apply_retention(session, days):
+    """ Alternativa/complemento al borrado: TTL por omisión y TWCS en las tablas de logs.
+
+    El TTL solo aplica a escrituras nuevas y debe ser mayor que el intervalo
+    entre corridas del archivo, o los eventos expirarán sin archivarse.
+    """
+    ttl = int(timedelta(days=days).total_seconds())
+    for table in ("logs_by_user", "user_events", "logs_by_role_day"):
+        session.execute(f"ALTER TABLE {table} WITH default_time_to_live = {ttl} AND compaction = "
+                        "{'class': 'TimeWindowCompactionStrategy', 'compaction_window_unit': 'DAYS', 'compaction_window_size': 1}")
+        print(f"{table}: TTL {days} días + TimeWindowCompactionStrategy")
+
+
+#################################################################
+# CONSULTA DEL ARCHIVO
+#################################################################
+
+def archived_logs(start, end, email=None, role=None, action=None, root=ARCHIVE_DIR):
+    """ Eventos archivados entre los días `start` y `end` (inclusive), del más reciente al más antiguo.
+
+    Generador de dicts: lee un día (directorio) a la vez, así que la memoria
+    queda acotada por el día más grande y no por el rango. Las filas repetidas
+    en varios archivos, (email, action, action_date), se regresan una vez.
+    """
+    if not os.path.isdir(root):
+        return
+    dataset = ds.dataset(root, format="parquet", partitioning=DAY_PARTITIONING)
+    predicate = None
+    for field, value in (("email", email), ("role", role), ("action", action)):
+        if value:
+            term = ds.field(field) == value
+            predicate = term if predicate is None else predicate & term
+    day = end
+    while day >= start:
+        condition = ds.field("day") == day.isoformat()
+        if predicate is not None:
+            condition = condition & predicate
+        table = dataset.to_table(columns=["email", "action", "action_date", "role", "name"], filter=condition)
+        if table.num_rows:
+            table = table.take(pc.sort_indices(table, sort_keys=[("action_date", "descending")]))
+            seen = set()
+            for row in table.to_pylist():
+                key = (row["email"], row["action"], row["action_date"])
+                if key not in seen:
+                    seen.add(key)
+                    yield row
+        day -= timedelta(days=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiva en Parquet los logs de sesión antiguos y los borra de Cassandra.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_DAYS, help="Archivar eventos con más de N días")
+    parser.add_argument("--out", default=ARCHIVE_DIR, help="Directorio raíz del archivo Parquet")
+    parser.add_argument("--splits", type=int, default=ARCHIVE_SPLITS, help="Rangos de token")
+    parser.add_argument("--workers", type=int, default=ARCHIVE_WORKERS, help="Rangos en paralelo")
+    parser.add_argument("--keep", action="store_true", help="Solo exportar; no borrar de Cassandra")
+    parser.add_argument("--retention", type=int, default=None,
+                        help="Además aplicar TTL de N días y TWCS a las tablas de logs (N > --days)")
+    args = parser.parse_args()
+
+    session = connect_cassandra()
+    cutoff = cutoff_for(args.days)
+    print(f"Archivando eventos anteriores a {cutoff:%Y-%m-%d} en {args.out} ({args.splits} rangos, {args.workers} hilos)...")
+    ok = LogArchiver(session, args.out, cutoff, delete=not args.keep).run(args.splits, args.workers)
+    if args.retention:
+        if args.retention <= args.days:
+            print("ADVERTENCIA: --retention debe ser mayor que --days; no se aplicó el TTL.")
+        else:
+            apply_retention(session, args.retention)
+    if not ok:
+        print("Hubo errores: los rangos con error no se borraron por completo; volver a correr el archivo.")
@@ -0,0 +1,138 @@
+import atexit
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+#################################################################
+# ESCRITOR ASÍNCRONO DE LOGS DE SESIÓN (CASSANDRA)
+#################################################################
+
+AUDIT_QUEUE_SIZE = 10000       # Eventos máximos en memoria antes de descartar
+AUDIT_BATCH_SIZE = 100         # Eventos que el worker escribe por ronda
+AUDIT_FLUSH_INTERVAL = 0.2     # Segundos que el worker espera por nuevos eventos
+AUDIT_FLUSH_TIMEOUT = 5.0      # Espera máxima del flush en logout/salida
+
+
+class AuditWriter:
+    """ Cola acotada de eventos de login/logout drenada por un hilo en segundo plano.
+
+    El hilo del usuario solo encola el evento; el worker escribe cada ronda en
+    todas las tablas de logs con execute_async concurrentes (las filas van a
+    particiones distintas, por lo que un batch no ahorraría trabajo al
+    coordinador).
+    """
+
+    def __init__(self, cass, max_queue=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.cass = cass
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._worker.start()
+
+    def log(self, user, action, action_date=None):
+        """ Encola un evento de sesión. Regresa False si la cola está llena y el evento se descarta. """
+        if not user.get("user_uuid"):
+            return False
+        event = {
+            "email": user["email"],
+            "name": user["name"],
+            "role": user.get("role", "student"),
+            "user_id": uuid.UUID(user["user_uuid"]),
+            "action": action,
+            "action_date": action_date or datetime.now().replace(microsecond=0),
+        }
+        try:
+            self.queue.put_nowait(event)
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _statements(self, e):
+        """ Sentencias (nombre, parámetros) que se escriben por cada evento. """
+        return [
+            ("log_user_insert", (e["email"], e["action"], e["action_date"], e["user_id"], e["name"], e["role"])),
+            ("user_event_insert", (e["email"], e["action_date"], e["action"], e["user_id"], e["name"], e["role"])),
+            ("log_role_day_insert", (e["role"], e["action_date"].date(), e["action_date"], e["email"], e["action"], e["name"], e["user_id"])),
+        ]
+
+    def _write(self, events):
+        futures = []
+        for e in events:
+            futures.append([self.cass.run_async(name, params) for name, params in self._statements(e)])
+        for event_futures in futures:
+            ok = True
+            for f in event_futures:
+                try:
+                    f.result()
+                except Exception:
+                    ok = False
+            if ok: self.written += 1
+            else: self.failed += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                events = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(events)
+            except Exception:
+                self.failed += len(events)
+            finally:
+                for _ in events:
+                    self.queue.task_done()
+
+    def flush(self, timeout=AUDIT_FLUSH_TIMEOUT):
+        """ Bloquea hasta que todos los eventos encolados se hayan escrito. Regresa False si vence el timeout. """
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=AUDIT_FLUSH_TIMEOUT):
+        flushed = self.flush(timeout)
+        self._stop.set()
+        return flushed
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+_audit_writer = None
+
+def init_audit_writer(writer):
+    """ Registra el escritor compartido y garantiza un flush al terminar el proceso. """
+    global _audit_writer
+    _audit_writer = writer
+    atexit.register(writer.close)
+    return _audit_writer
+
+def get_audit_writer():
+    return _audit_writer
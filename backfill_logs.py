@@ -0,0 +1,101 @@
+import time
+import argparse
+from itertools import islice
+
+from cassandra import InvalidRequest
+from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent
+
+from connect import connect_cassandra
+
+#################################################################
+# BACKFILL DE LAS TABLAS DE LOGS POR TIEMPO
+#################################################################
+# Los escritores llenan user_events junto con logs_by_user desde que existe
+# la tabla, pero los eventos anteriores solo están en logs_by_user. Este
+# trabajo (de una sola vez) recorre logs_by_user por páginas y copia cada
+# evento a user_events con inserts concurrentes. Igual con la tabla anterior
+# logs_by_role (una partición por rol), que se reemplazó por logs_by_role_day:
+# sus eventos se copian a la partición (rol, día) que les toca. Es idempotente
+# (los INSERT son upserts) y se puede correr con la aplicación en línea; ya
+# copiado, logs_by_role se puede borrar (DROP TABLE).
+
+BACKFILL_FETCH_SIZE = 5000
+BACKFILL_CONCURRENCY = 100
+BACKFILL_CHUNK_SIZE = 20000
+
+
+def _run_chunks(session, statements, concurrency, chunk_size, label):
+    """ Ejecuta `statements` (iterador) por bloques, como activity_buckets.migrate. Regresa (copiadas, errores). """
+    rows = errors = 0
+    started = time.perf_counter()
+    while chunk := list(islice(statements, chunk_size)):
+        for ok, _ in execute_concurrent(session, chunk, concurrency=concurrency, raise_on_first_error=False):
+            if ok: rows += 1
+            else: errors += 1
+        elapsed = time.perf_counter() - started
+        print(f"  {label}: {rows} filas copiadas ({rows / elapsed:,.0f} filas/s), {errors} errores")
+    return rows, errors
+
+
+#################################################################
+# logs_by_user -> user_events
+#################################################################
+
+def _user_event_statements(session, insert, fetch_size):
+    scan = SimpleStatement("SELECT email, action, action_date, user_id, name, role FROM logs_by_user", fetch_size=fetch_size)
+    for r in session.execute(scan):
+        yield insert, (r.email, r.action_date, r.action, r.user_id, r.name, r.role)
+
+
+def backfill_user_events(session, concurrency=BACKFILL_CONCURRENCY, fetch_size=BACKFILL_FETCH_SIZE,
+                         chunk_size=BACKFILL_CHUNK_SIZE):
+    """ Copia todos los eventos de logs_by_user a user_events. Regresa (copiadas, errores). """
+    insert = session.prepare("INSERT INTO user_events (email, action_date, action, user_id, name, role) VALUES (?, ?, ?, ?, ?, ?)")
+    return _run_chunks(session, _user_event_statements(session, insert, fetch_size), concurrency, chunk_size, "user_events")
+
+
+#################################################################
+# logs_by_role -> logs_by_role_day
+#################################################################
+
+def _role_day_statements(session, insert, fetch_size):
+    scan = SimpleStatement("SELECT role, email, action_date, name, action, user_id FROM logs_by_role", fetch_size=fetch_size)
+    for r in session.execute(scan):
+        yield insert, (r.role, r.action_date.date(), r.action_date, r.email, r.action, r.name, r.user_id)
+
+
+def migrate_role_logs(session, concurrency=BACKFILL_CONCURRENCY, fetch_size=BACKFILL_FETCH_SIZE,
+                      chunk_size=BACKFILL_CHUNK_SIZE):
+    """ Copia la tabla anterior logs_by_role a logs_by_role_day. Regresa (copiadas, errores). """
+    insert = session.prepare("INSERT INTO logs_by_role_day (role, day, action_date, email, action, name, user_id) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    try:
+        return _run_chunks(session, _role_day_statements(session, insert, fetch_size), concurrency, chunk_size, "logs_by_role_day")
+    except InvalidRequest as e:
+        print(f"  No se pudo leer logs_by_role (¿ya se borró?): {e}")
+        return 0, 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copia (una sola vez) los logs de sesión existentes a las tablas por tiempo.")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY, help="Inserts simultáneos en Cassandra")
+    parser.add_argument("--fetch-size", type=int, default=BACKFILL_FETCH_SIZE, help="Filas por página al recorrer la tabla origen")
+    parser.add_argument("--skip-user-events", action="store_true", help="No copiar logs_by_user a user_events")
+    parser.add_argument("--skip-role-days", action="store_true", help="No copiar logs_by_role a logs_by_role_day")
+    args = parser.parse_args()
+
+    session = connect_cassandra()
+    errors = 0
+    if not args.skip_user_events:
+        print("Copiando logs_by_user a user_events...")
+        copied, failed = backfill_user_events(session, args.concurrency, args.fetch_size)
+        print(f"Copia terminada: {copied} filas, {failed} errores.")
+        errors += failed
+    if not args.skip_role_days:
+        print("Copiando logs_by_role a logs_by_role_day...")
+        copied, failed = migrate_role_logs(session, args.concurrency, args.fetch_size)
+        print(f"Copia terminada: {copied} filas, {failed} errores.")
+        errors += failed
+    if errors:
+        print("Hubo errores: volver a correr el backfill (es idempotente).")
@@ -0,0 +1,98 @@
+import time
+import random
+import argparse
+
+import numpy as np
+import pymongo
+
+from bulk_load import iter_chunks
+from generate_data import LearnLinkGenerator
+from lesson_search import add_url_grams, ensure_lesson_indexes, search_lessons
+
+#################################################################
+# BENCHMARK: BÚSQUEDA DE LECCIONES ($regex vs índice)
+#################################################################
+# Carga N lecciones sintéticas en una base aparte y mide la latencia de la
+# consulta anterior (regex sin ancla sobre title/url, sin paginar) contra
+# search_lessons (página 0) con los mismos términos.
+
+
+def regex_search(db, term):
+    query = {"$or": [{"title": {"$regex": term, "$options": "i"}}, {"url": {"$regex": term, "$options": "i"}}]}
+    return list(db.lessons.find(query))
+
+
+def make_generator(n, lessons_per_course):
+    return LearnLinkGenerator(users=1, instructors=max(1, n // 1000), courses=-(-n // lessons_per_course),
+                              enrollments=0, reviews=0, logs=0, lessons_per_course=lessons_per_course)
+
+
+def load_lessons(db, gen, chunk_size):
+    def lessons():
+        for k in range(1, gen.courses + 1):
+            title = gen.course(k)["title"]
+            for j in range(1, gen.lessons_per_course + 1):
+                yield add_url_grams(gen.lesson(k, j, title))
+
+    db.lessons.drop()
+    started = time.perf_counter()
+    total = 0
+    for chunk in iter_chunks(lessons(), chunk_size):
+        total += len(db.lessons.insert_many(chunk, ordered=False).inserted_ids)
+    ensure_lesson_indexes(db)
+    print(f"{total} lecciones cargadas e indexadas en {time.perf_counter() - started:.1f} s")
+
+
+def sample_terms(gen, rng, count):
+    """ Mezcla de términos: palabras de título, subcadenas selectivas de URL y un término amplio. """
+    terms = []
+    for _ in range(count):
+        k = rng.randint(1, gen.courses)
+        n = rng.randint(1, gen.lessons_per_course)
+        kind = rng.random()
+        if kind < 0.4:
+            terms.append(gen.course(k)["title"].split()[0])
+        elif kind < 0.9:
+            terms.append(f"cursos/{k}/leccion{n}")
+        else:
+            terms.append("learnlink")
+    return terms
+
+
+def measure(fn, terms):
+    times = []
+    for term in terms:
+        started = time.perf_counter()
+        fn(term)
+        times.append((time.perf_counter() - started) * 1000)
+    return np.percentile(times, [50, 95, 99])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la búsqueda de lecciones con $regex contra el índice de texto/trigramas.")
+    parser.add_argument("--uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--db", default="learnlink_bench", help="Base de datos desechable para el benchmark")
+    parser.add_argument("--lessons", type=int, default=1_000_000)
+    parser.add_argument("--lessons-per-course", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--skip-load", action="store_true", help="Reutiliza las lecciones ya cargadas")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    db = pymongo.MongoClient(args.uri)[args.db]
+    gen = make_generator(args.lessons, args.lessons_per_course)
+    if not args.skip_load:
+        load_lessons(db, gen, args.chunk_size)
+
+    terms = sample_terms(gen, random.Random(args.seed), args.queries)
+    results = [
+        ("$regex (anterior)", measure(lambda t: regex_search(db, t), terms)),
+        ("search_lessons", measure(lambda t: search_lessons(db, t, 0, args.page_size), terms)),
+    ]
+
+    print(f"\n{args.queries} consultas sobre {db.lessons.estimated_document_count()} lecciones (ms)")
+    print(f"{'Método':<20}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, (p50, p95, p99) in results:
+        print(f"{name:<20}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pymongo import monitoring
+
+import service
+from service import ServiceError
+from enrollment import DuplicateEnrollmentError
+from catalog import get_catalog_cache
+from dgraph_client import get_client
+
+#################################################################
+# PRUEBA DE CARGA: SESIONES CONCURRENTES SOBRE LA CAPA DE SERVICIOS
+#################################################################
+# Cada usuario virtual ejecuta una sesión completa (login -> ... -> logout)
+# contra el stack de docker-compose usando las mismas funciones que la
+# terminal y el servidor HTTP. Se mide la latencia por operación y por base
+# (Mongo vía CommandListener, Cassandra y Dgraph envolviendo sus clientes).
+# Escribe inscripciones y reseñas reales: usar solo sobre datos sintéticos.
+
+STUDENT_PASSWORD = "12345678"
+ADMIN_PASSWORD = "1234"
+
+
+class Recorder:
+    """ Latencias (ms) por llave, seguras entre hilos. """
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, ms, error=False):
+        with self._lock:
+            self.samples.setdefault(key, []).append(ms)
+            if error:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summary(self, elapsed):
+        out = {}
+        with self._lock:
+            for key, values in sorted(self.samples.items()):
+                arr = np.asarray(values)
+                p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+                out[key] = {"count": len(arr), "errors": self.errors.get(key, 0),
+                            "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2),
+                            "max_ms": round(float(arr.max()), 2), "throughput_s": round(len(arr) / elapsed, 2)}
+        return out
+
+
+class MongoTimer(monitoring.CommandListener):
+    """ Tiempo de cada comando de Mongo reportado por el driver. """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.recorder.add(f"mongo.{event.command_name}", event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.recorder.add(f"mongo.{event.command_name}", event.duration_micros / 1000, error=True)
+
+
+def time_backend(recorder, cass, dgraph):
+    """ Envuelve las llamadas de Cassandra (run/run_async) y Dgraph (query/mutate) de esta instancia. """
+    def timed(key, fn):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                recorder.add(key(args), (time.perf_counter() - started) * 1000, error=True)
+                raise
+            recorder.add(key(args), (time.perf_counter() - started) * 1000)
+            return result
+        return wrapper
+
+    def timed_async(fn):
+        def wrapper(name, *args, **kwargs):
+            started = time.perf_counter()
+            future = fn(name, *args, **kwargs)
+            future.add_callbacks(
+                lambda _: recorder.add(f"cassandra.{name}", (time.perf_counter() - started) * 1000),
+                lambda _: recorder.add(f"cassandra.{name}", (time.perf_counter() - started) * 1000, error=True))
+            return future
+        return wrapper
+
+    cass.run = timed(lambda a: f"cassandra.{a[0]}", cass.run)
+    cass.run_async = timed_async(cass.run_async)
+    dgraph.query = timed(lambda a: "dgraph.query", dgraph.query)
+    dgraph.mutate = timed(lambda a: "dgraph.mutate", dgraph.mutate)
+
+
+#################################################################
+# SESIONES VIRTUALES
+#################################################################
+
+class VirtualUsers:
+    def __init__(self, mongo, cass, recorder, students, instructors, think_time, seed):
+        self.mongo = mongo
+        self.cass = cass
+        self.recorder = recorder
+        self.students = students
+        self.instructors = instructors
+        self.think_time = think_time
+        self.titles = list(get_catalog_cache().by_title)
+        self.seed = seed
+
+    def step(self, name, fn, *args, expected=()):
+        """ Ejecuta una operación y registra su latencia; los errores esperados no cuentan como fallas. """
+        started = time.perf_counter()
+        error = False
+        try:
+            return fn(*args)
+        except expected:
+            return None
+        except Exception:
+            error = True
+            return None
+        finally:
+            self.recorder.add(f"op.{name}", (time.perf_counter() - started) * 1000, error=error)
+            if self.think_time:
+                time.sleep(self.think_time)
+
+    def login(self, email, password):
+        user = self.step("login", service.authenticate, self.mongo, email, password)
+        if user:
+            service.start_session(user)
+        return user
+
+    def student(self, n, rng):
+        user = self.login(f"alumno{rng.randint(1, self.students)}@learnlink.mx", STUDENT_PASSWORD)
+        if not user:
+            return
+        title = rng.choice(self.titles)
+        self.step("mis_calificaciones", service.student_portfolio, self.cass, user["email"], "completed")
+        self.step("inscribirse_curso", service.enroll, self.mongo, self.cass, user, title, expected=(DuplicateEnrollmentError,))
+        self.step("escribir_reseña", service.write_review, self.mongo, user, title,
+                  f"Prueba de carga {n}", rng.randint(1, 10), expected=(ServiceError,))
+        self.step("D4", service.report_d4, user["email"], expected=(ServiceError,))
+        self.step("logout", service.end_session, user)
+
+    def instructor(self, n, rng):
+        user = self.login(f"instructor{rng.randint(1, self.instructors)}@learnlink.mx", STUDENT_PASSWORD)
+        if not user:
+            return
+        courses = self.step("cursos_instructor", service.instructor_courses, user["email"]) or []
+        if courses:
+            title = rng.choice(courses)["title"]
+            self.step("calificaciones_curso", service.course_activity, self.cass, title, "completed")
+            self.step("contar_lecciones", service.count_lessons, self.mongo, title)
+        self.step("logout", service.end_session, user)
+
+    def admin(self, n, rng):
+        user = self.login("admin", ADMIN_PASSWORD)
+        if not user:
+            return
+        today = date.today()
+        self.step("logs_por_rol", service.logs_by_role, self.cass, "student", today - timedelta(days=6), today)
+        self.step("D2", service.report_d2, 20)
+        self.step("D10", service.report_d10)
+        self.step("logout", service.end_session, user)
+
+    def run(self, n, role):
+        rng = random.Random(f"{self.seed}:{n}")
+        started = time.perf_counter()
+        getattr(self, role)(n, rng)
+        self.recorder.add(f"session.{role}", (time.perf_counter() - started) * 1000)
+
+
+def role_plan(sessions, mix, seed):
+    """ Lista de roles (uno por sesión) según los pesos de `mix`, p. ej. {'student': 8, 'instructor': 1, 'admin': 1}. """
+    rng = random.Random(seed)
+    roles, weights = zip(*mix.items())
+    return rng.choices(roles, weights=weights, k=sessions)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        role, weight = part.split("=")
+        mix[role.strip()] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula sesiones concurrentes de LearnLink y reporta p50/p95/p99 por operación y por base.")
+    parser.add_argument("--sessions", type=int, default=2000, help="Usuarios virtuales (sesiones completas) a ejecutar")
+    parser.add_argument("--concurrency", type=int, default=200, help="Sesiones simultáneas")
+    parser.add_argument("--mix", default="student=8,instructor=1,admin=1", help="Pesos por rol")
+    parser.add_argument("--students", type=int, default=1000, help="alumno1..N existentes (ver generate_data.py)")
+    parser.add_argument("--instructors", type=int, default=20, help="instructor1..N existentes")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Segundos de pausa entre operaciones")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="Archivo JSON de resultados (default: data/load_<fecha>.json)")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    monitoring.register(MongoTimer(recorder))       # Debe registrarse antes de crear el MongoClient
+    mongo_conn, cass_conn = service.start_backends(dgraph_pool_size=args.concurrency, enrollment_workers=args.concurrency)
+    time_backend(recorder, cass_conn, get_client())
+
+    vus = VirtualUsers(mongo_conn, cass_conn, recorder, args.students, args.instructors, args.think_time, args.seed)
+    plan = role_plan(args.sessions, parse_mix(args.mix), args.seed)
+
+    print(f"Ejecutando {args.sessions} sesiones con concurrencia {args.concurrency}...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="vu") as pool:
+        list(pool.map(vus.run, range(len(plan)), plan))
+    elapsed = time.perf_counter() - started
+
+    results = recorder.summary(elapsed)
+    print(f"\n{args.sessions} sesiones en {elapsed:.1f} s ({args.sessions / elapsed:.1f} sesiones/s)\n")
+    print(f"{'Llave':<38}{'n':>8}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'ops/s':>9}")
+    for key, r in results.items():
+        print(f"{key:<38}{r['count']:>8}{r['errors']:>6}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['throughput_s']:>9.1f}")
+
+    os.makedirs("data", exist_ok=True)
+    out = args.out or f"data/load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "elapsed_s": round(elapsed, 2), "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {out}")
@@ -0,0 +1,285 @@
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from itertools import islice
+
+import pydgraph
+from pymongo.errors import BulkWriteError
+from cassandra.concurrent import execute_concurrent
+
+from activity_buckets import activity_bucket
+
+#################################################################
+# CARGA MASIVA EN PARALELO (MODO --bulk DE populate.py)
+#################################################################
+
+MONGO_COLLECTIONS = ["users", "courses", "lessons", "enrollments", "reviews"]
+READ_SIZE = 1 << 16
+
+RDF_LINE = re.compile(r'^\s*(_:\S+|<[^>]+>)\s+(<[^>]+>)\s+(.*?)\s*\.\s*$')
+
+
+def report_throughput(store, rows, started, errors=0):
+    """ Imprime filas/s de una base. """
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    extra = f", {errors} errores" if errors else ""
+    print(f"{store}: {rows} filas en {elapsed:.2f}s ({rows / elapsed:,.0f} filas/s{extra})")
+
+
+def iter_chunks(iterable, size):
+    """ Agrupa un iterable en listas de `size` elementos sin materializarlo. """
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(path, key, read_size=READ_SIZE):
+    """ Recorre en streaming los objetos del arreglo `key` de un archivo JSON.
+
+    Solo mantiene en memoria el bloque leído y el objeto actual, así que sirve
+    para archivos que no caben en RAM (a diferencia de json.load).
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while True:
+            m = start.search(buf)
+            if m:
+                pos = m.end()
+                break
+            chunk = f.read(read_size)
+            if not chunk:
+                return
+            buf = buf[-256:] + chunk
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                chunk = f.read(read_size)
+                if not chunk:
+                    raise ValueError(f"JSON truncado en '{key}' ({path})")
+                buf, pos = chunk, 0
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(read_size)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield obj
+            pos = end
+            if pos > read_size:
+                buf, pos = buf[pos:], 0
+
+
+#################################################################
+# MONGO
+#################################################################
+
+def load_mongo(db, path, chunk_size=5000, transforms=None):
+    """ insert_many desordenado y por bloques para cada colección del archivo.
+
+    `transforms` mapea colección -> función aplicada a cada documento antes de insertarlo.
+    """
+    transforms = transforms or {}
+    for name in MONGO_COLLECTIONS:
+        started = time.perf_counter()
+        rows = errors = 0
+        docs = iter_json_array(path, name)
+        if name in transforms:
+            docs = map(transforms[name], docs)
+        for chunk in iter_chunks(docs, chunk_size):
+            try:
+                rows += len(db[name].insert_many(chunk, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                rows += e.details.get("nInserted", 0)
+                errors += len(e.details.get("writeErrors", []))
+        report_throughput(f"MongoDB.{name}", rows, started, errors)
+
+
+#################################################################
+# CASSANDRA
+#################################################################
+
+def _log_statements(path, q_logs_user, q_logs_role, q_user_events=None):
+    for log in iter_json_array(path, "logging_info_by_email"):
+        role = log.get("role", "student")
+        uid = uuid.UUID(log["user_id"])
+        dt = datetime.fromisoformat(log["action_date"])
+        yield q_logs_user, (log["email"], log["action"], dt, uid, log["name"], role)
+        yield q_logs_role, (role, dt.date(), dt, log["email"], log["action"], log["name"], uid)
+        if q_user_events is not None:
+            yield q_user_events, (log["email"], dt, log["action"], uid, log["name"], role)
+
+def _course_statements(path, q_student, q_course, q_course_bucket=None):
+    for c in iter_json_array(path, "course_info_by_status"):
+        grade = float(c["grade"]) if c.get("grade") is not None else 0.0
+        uid = uuid.UUID(c["user_id"])
+        cid = uuid.UUID(c["course_id"])
+        yield q_student, (c["email"], c["status"], c["course_title"], grade, cid, uid, c["name"])
+        if q_course is not None:
+            yield q_course, (c["course_title"], c["status"], grade, c["email"], c["name"], cid, uid)
+        if q_course_bucket is not None:
+            yield q_course_bucket, (c["course_title"], activity_bucket(c["email"]), c["status"], grade, c["email"], c["name"], cid, uid)
+
+def _run_concurrent(session, statements, concurrency, chunk_size):
+    rows = errors = 0
+    # Se envía por bloques para que la lista de resultados no crezca sin límite.
+    for chunk in iter_chunks(statements, chunk_size):
+        for ok, _ in execute_concurrent(session, chunk, concurrency=concurrency, raise_on_first_error=False):
+            if ok: rows += 1
+            else: errors += 1
+    return rows, errors
+
+def load_cassandra(session, path, q_logs_user, q_logs_role, q_student, q_course, q_course_bucket=None,
+                   q_user_events=None, concurrency=100, chunk_size=20000):
+    """ Inserta logs y actividad con execute_concurrent y concurrencia configurable.
+
+    `q_course` (course_activity) puede ser None después del corte a buckets.
+    """
+    started = time.perf_counter()
+    rows, errors = _run_concurrent(session, _log_statements(path, q_logs_user, q_logs_role, q_user_events), concurrency, chunk_size)
+    report_throughput("Cassandra.logs", rows, started, errors)
+
+    started = time.perf_counter()
+    rows, errors = _run_concurrent(session, _course_statements(path, q_student, q_course, q_course_bucket), concurrency, chunk_size)
+    report_throughput("Cassandra.cursos", rows, started, errors)
+
+
+#################################################################
+# DGRAPH
+#################################################################
+
+def _mutate_with_retry(client, nquads, retries):
+    """ Mutación con commit inmediato; reintenta con backoff si la transacción aborta. """
+    for attempt in range(retries + 1):
+        txn = client.txn()
+        try:
+            return dict(txn.mutate(set_nquads=nquads, commit_now=True).uids)
+        except pydgraph.errors.AbortedError:
+            if attempt == retries:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+        finally:
+            txn.discard()
+
+class _ParallelMutator:
+    """ Envía bloques de N-Quads a un pool de hilos con un máximo de bloques en vuelo. """
+
+    def __init__(self, client, workers, retries):
+        self.client = client
+        self.retries = retries
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_in_flight = workers * 2
+        self.pending = {}
+        self.uids = {}
+        self.rows = 0
+        self.errors = 0
+
+    def _collect(self, done):
+        for f in done:
+            n = self.pending.pop(f)
+            try:
+                self.uids.update(f.result())
+                self.rows += n
+            except Exception as e:
+                self.errors += n
+                print(f"Error en bloque Dgraph ({n} quads): {e}")
+
+    def submit(self, lines):
+        if len(self.pending) >= self.max_in_flight:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        f = self.executor.submit(_mutate_with_retry, self.client, "\n".join(lines), self.retries)
+        self.pending[f] = len(lines)
+
+    def finish(self):
+        done, _ = wait(self.pending)
+        self._collect(done)
+        self.executor.shutdown()
+
+def _resolve(term, uids):
+    """ Cambia un blank node por su UID ya asignado; None si no existe. """
+    if not term.startswith("_:"):
+        return term
+    uid = uids.get(term[2:])
+    return f"<{uid}>" if uid else None
+
+def load_dgraph(client, path, chunk_size=5000, workers=8, retries=5):
+    """ Divide el RDF en transacciones paralelas.
+
+    Los blank nodes (_:u1) solo son válidos dentro de una misma mutación, así
+    que la carga es en dos fases:
+      1. Los quads con valor literal de cada blank node se envían en bloques
+         paralelos (un nodo nunca queda repartido en dos bloques) y se guardan
+         los UIDs asignados.
+      2. Las aristas y los quads restantes se reescriben con esos UIDs y se
+         envían también en bloques paralelos.
+    """
+    started = time.perf_counter()
+    created = set()
+    deferred = tempfile.NamedTemporaryFile("w+", encoding="utf-8", suffix=".rdf", delete=False)
+    phase1 = _ParallelMutator(client, workers, retries)
+
+    try:
+        chunk, chunk_labels, last_subject = [], set(), None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                m = RDF_LINE.match(line)
+                if not m:
+                    continue
+                subject, _, obj = m.groups()
+                is_new_node = subject.startswith("_:") and not obj.startswith("_:") and subject not in created
+                if not is_new_node:
+                    deferred.write(line if line.endswith("\n") else line + "\n")
+                    continue
+                if len(chunk) >= chunk_size and subject != last_subject and subject not in chunk_labels:
+                    phase1.submit(chunk)
+                    created.update(chunk_labels)
+                    chunk, chunk_labels = [], set()
+                chunk.append(line.strip())
+                chunk_labels.add(subject)
+                last_subject = subject
+        if chunk:
+            phase1.submit(chunk)
+        phase1.finish()
+
+        phase2 = _ParallelMutator(client, workers, retries)
+        uids = phase1.uids
+        unresolved = 0
+        deferred.seek(0)
+        chunk = []
+        for line in deferred:
+            subject, predicate, obj = RDF_LINE.match(line).groups()
+            subject, obj = _resolve(subject, uids), _resolve(obj, uids)
+            if subject is None or obj is None:
+                unresolved += 1
+                continue
+            chunk.append(f"{subject} {predicate} {obj} .")
+            if len(chunk) >= chunk_size:
+                phase2.submit(chunk)
+                chunk = []
+        if chunk:
+            phase2.submit(chunk)
+        phase2.finish()
+    finally:
+        deferred.close()
+        os.unlink(deferred.name)
+
+    if unresolved:
+        print(f"ADVERTENCIA: {unresolved} quads referencian blank nodes sin valores propios y se omitieron.")
+    report_throughput("Dgraph", phase1.rows + phase2.rows, started, phase1.errors + phase2.errors)
@@ -0,0 +1,355 @@
+import re
+import bisect
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import pymongo
+from pymongo.errors import PyMongoError
+from tabulate import tabulate
+
+#################################################################
+# CATÁLOGO DE CURSOS PAGINADO
+#################################################################
+
+CATALOG_PAGE_SIZE = 15
+CATALOG_CACHE_TTL = 300.0           # Recarga completa cada N segundos
+CATALOG_VERSION_CHECK = 5.0         # Segundos entre lecturas del contador de versión
+CATALOG_CACHE_MAX = 20000           # Cursos máximos en memoria
+CATALOG_FIELDS = {"_id": 0, "title": 1, "course_uuid": 1, "instructor_email": 1, "category": 1}
+AUTOCOMPLETE_TOP_K = 8
+AUTOCOMPLETE_REFRESH = 5.0          # Segundos entre sondeos de cursos nuevos
+
+
+def iter_catalog_pages(mongo, fields=("title",), category=None, query=None, page_size=CATALOG_PAGE_SIZE):
+    """ Genera páginas del catálogo bajo demanda, ordenadas por título.
+
+    Paginación por llave (title > último título visto) sobre el índice
+    {title: 1} / {category: 1, title: 1}, con proyección solo de `fields`:
+    cada página es una consulta pequeña sin importar el tamaño del catálogo.
+    """
+    projection = {"_id": 0, "title": 1, **{f: 1 for f in fields}}
+    last_title = None
+    while True:
+        filtro = dict(query or {})
+        if category:
+            filtro["category"] = category
+        if last_title is not None:
+            filtro["title"] = {"$gt": last_title}
+        page = list(mongo.courses.find(filtro, projection).sort("title", pymongo.ASCENDING).limit(page_size))
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_title = page[-1]["title"]
+
+
+def seleccionar_curso(mongo, fields=("title",), headers=("Cursos",), query=None, prompt="Nombre del curso"):
+    """ Muestra el catálogo página por página y regresa el título que escriba el usuario ('' si cancela).
+
+    '+' avanza a la siguiente página y '/categoría' filtra por categoría
+    ('/' solo quita el filtro).
+    """
+    category = None
+    pages = iter_catalog_pages(mongo, fields, category, query)
+    page = next(pages, None)
+    page_no = 1
+    while True:
+        if page:
+            filtro = f" | Categoría: {category}" if category else ""
+            print("\n" + f"--- CURSOS (página {page_no}{filtro}) ---".center(80))
+            print(tabulate([[c.get(f, "") for f in fields] for c in page], headers=list(headers), tablefmt="fancy_grid"))
+        else:
+            print("\n[No hay más cursos para mostrar]")
+
+        opcion = input(f"\n{prompt} ('+' = siguiente página, '/categoría' = filtrar, Enter = cancelar): ").strip()
+        if opcion == "+":
+            page = next(pages, None)
+            page_no += 1
+        elif opcion.startswith("/"):
+            category = opcion[1:].strip() or None
+            pages = iter_catalog_pages(mongo, fields, category, query)
+            page = next(pages, None)
+            page_no = 1
+        elif not opcion or _catalog_cache is None or _autocomplete is None or _catalog_cache.get(opcion):
+            return opcion
+        else:
+            sugerencias = _autocomplete.complete(opcion)
+            if not sugerencias:
+                print(f"\n[Ningún curso coincide con '{opcion}']")
+                continue
+            print(tabulate([[n, t] for n, t in enumerate(sugerencias, 1)], headers=["#", "¿Quisiste decir?"], tablefmt="fancy_grid"))
+            eleccion = input("Número del curso (Enter = volver al catálogo): ").strip()
+            if eleccion.isdigit() and 1 <= int(eleccion) <= len(sugerencias):
+                return sugerencias[int(eleccion) - 1]
+
+
+#################################################################
+# CACHÉ DE CATÁLOGO CON INVALIDACIÓN POR VERSIÓN
+#################################################################
+
+def catalog_version(mongo):
+    doc = mongo.meta.find_one({"_id": "catalog_version"})
+    return doc.get("version", 0) if doc else 0
+
+
+def bump_catalog_version(mongo):
+    """ Incrementa el contador de versión del catálogo (colección meta). Invalida las cachés de todos los procesos. """
+    mongo.meta.update_one({"_id": "catalog_version"}, {"$inc": {"version": 1}}, upsert=True)
+
+
+class CatalogCache:
+    """ Caché de cursos por título y por course_uuid para todo el proceso.
+
+    Se invalida cuando cambia el contador `meta.catalog_version` (revisado a
+    lo más cada `version_check` segundos), por un change stream si Mongo
+    corre como replica set, o al vencer el TTL. Si el catálogo cabe en
+    `max_entries`, un título ausente se resuelve sin consultar a Mongo.
+    """
+
+    def __init__(self, mongo, ttl=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_MAX, version_check=CATALOG_VERSION_CHECK):
+        self.mongo = mongo
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_check = version_check
+        self.by_title = OrderedDict()
+        self.by_uuid = {}
+        self.by_instructor = {}
+        self.version = None
+        self.complete = False
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.watching = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def _put(self, course):
+        self.by_title[course["title"]] = course
+        self.by_title.move_to_end(course["title"])
+        if course.get("course_uuid"):
+            self.by_uuid[course["course_uuid"]] = course["title"]
+        if course.get("instructor_email"):
+            self.by_instructor.setdefault(course["instructor_email"], set()).add(course["title"])
+        while len(self.by_title) > self.max_entries:
+            _, old = self.by_title.popitem(last=False)
+            self.by_uuid.pop(old.get("course_uuid"), None)
+            self.by_instructor.get(old.get("instructor_email"), set()).discard(old["title"])
+            self.complete = False
+
+    def reload(self):
+        """ Recarga el catálogo (hasta max_entries cursos) con una sola consulta proyectada. """
+        with self._lock:
+            version = catalog_version(self.mongo)
+            self.by_title.clear()
+            self.by_uuid.clear()
+            self.by_instructor.clear()
+            loaded = 0
+            for course in self.mongo.courses.find({}, CATALOG_FIELDS).limit(self.max_entries + 1):
+                self._put(course)
+                loaded += 1
+            self.complete = loaded <= self.max_entries
+            self.version = version
+            self.loaded_at = self.checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded_at = 0.0
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if now - self.loaded_at > self.ttl:
+            self.reload()
+        elif not self.watching and now - self.checked_at > self.version_check:
+            self.checked_at = now
+            if catalog_version(self.mongo) != self.version:
+                self.reload()
+
+    def get(self, title):
+        """ Curso por título (dict con title, course_uuid, instructor_email, category) o None. """
+        with self._lock:
+            self._refresh_if_stale()
+            course = self.by_title.get(title)
+            if course is not None:
+                self.by_title.move_to_end(title)
+                self.hits += 1
+                return course
+            self.misses += 1
+            if self.complete:
+                return None
+        course = self.mongo.courses.find_one({"title": title}, CATALOG_FIELDS)
+        if course:
+            with self._lock:
+                self._put(course)
+        return course
+
+    def get_by_uuid(self, course_uuid):
+        with self._lock:
+            self._refresh_if_stale()
+            title = self.by_uuid.get(course_uuid)
+        if title is not None:
+            return self.get(title)
+        with self._lock:
+            self.misses += 1
+        course = self.mongo.courses.find_one({"course_uuid": course_uuid}, CATALOG_FIELDS)
+        if course:
+            with self._lock:
+                self._put(course)
+        return course
+
+    def courses_of(self, instructor_email):
+        """ Cursos que imparte un instructor, ordenados por título. """
+        with self._lock:
+            self._refresh_if_stale()
+            if self.complete:
+                return [self.by_title[t] for t in sorted(self.by_instructor.get(instructor_email, ()))]
+        cursor = self.mongo.courses.find({"instructor_email": instructor_email}, CATALOG_FIELDS)
+        return list(cursor.sort("title", pymongo.ASCENDING))
+
+    def start_change_stream(self):
+        """ Escucha cambios en `courses` si Mongo es replica set. Regresa False si no está disponible. """
+        try:
+            stream = self.mongo.courses.watch()
+        except PyMongoError:
+            return False
+
+        def _listen():
+            try:
+                for _ in stream:
+                    self.invalidate()
+            except PyMongoError:
+                pass
+            finally:
+                self.watching = False
+
+        self.watching = True
+        threading.Thread(target=_listen, name="catalog-watch", daemon=True).start()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"courses": len(self.by_title), "version": self.version, "complete": self.complete,
+                    "watching": self.watching, "hits": self.hits, "misses": self.misses}
+
+
+_catalog_cache = None
+
+def init_catalog_cache(cache):
+    """ Registra la caché de catálogo compartida por el proceso. """
+    global _catalog_cache
+    _catalog_cache = cache
+    return _catalog_cache
+
+def get_catalog_cache():
+    return _catalog_cache
+
+
+#################################################################
+# AUTOCOMPLETADO DE TÍTULOS
+#################################################################
+
+def normalize_title(text):
+    """ Minúsculas, sin acentos y con espacios colapsados: 'Cálculo  I' -> 'calculo i'. """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CourseAutocomplete:
+    """ Arreglo ordenado de (sufijo normalizado, título) para búsqueda por prefijo con bisect.
+
+    Cada título aporta una entrada por palabra ('bases de datos', 'de datos',
+    'datos'), así que 'datos' sugiere 'Bases de Datos'. Los cursos nuevos se
+    agregan sondeando `_id > último visto`; un cambio de `catalog_version`
+    reconstruye todo. Si no hay coincidencias por prefijo se usa $text.
+    """
+
+    def __init__(self, mongo, top_k=AUTOCOMPLETE_TOP_K, refresh_interval=AUTOCOMPLETE_REFRESH):
+        self.mongo = mongo
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self.keys = []
+        self.titles = []
+        self.starts = []
+        self.last_id = None
+        self.version = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entries(title):
+        norm = normalize_title(title)
+        return [(norm[start:], title, start == 0) for start in [0] + [m.end() for m in re.finditer(" ", norm)]]
+
+    def _insert(self, title):
+        for key, title, first in self._entries(title):
+            idx = bisect.bisect_left(self.keys, key)
+            self.keys.insert(idx, key)
+            self.titles.insert(idx, title)
+            self.starts.insert(idx, first)
+
+    def rebuild(self):
+        """ Reconstruye el arreglo completo (ordenado una sola vez). """
+        with self._lock:
+            self.version = catalog_version(self.mongo)
+            entries = []
+            self.last_id = None
+            for doc in self.mongo.courses.find({}, {"title": 1}).sort("_id", pymongo.ASCENDING):
+                entries.extend(self._entries(doc["title"]))
+                self.last_id = doc["_id"]
+            entries.sort()
+            self.keys = [e[0] for e in entries]
+            self.titles = [e[1] for e in entries]
+            self.starts = [e[2] for e in entries]
+            self.checked_at = time.monotonic()
+
+    def refresh(self):
+        """ Incremental: solo lee cursos con _id mayor al último visto. """
+        if catalog_version(self.mongo) != self.version:
+            self.rebuild()
+            return
+        with self._lock:
+            filtro = {"_id": {"$gt": self.last_id}} if self.last_id is not None else {}
+            for doc in self.mongo.courses.find(filtro, {"title": 1}).sort("_id", pymongo.ASCENDING):
+                self._insert(doc["title"])
+                self.last_id = doc["_id"]
+            self.checked_at = time.monotonic()
+
+    def _prefix_matches(self, prefix, k):
+        """ Hasta k títulos distintos; los que empiezan con el prefijo van antes que los de palabra interna. """
+        with self._lock:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + "\uffff", lo)
+            found = {}
+            for i in range(lo, min(hi, lo + 4 * k)):
+                found[self.titles[i]] = found.get(self.titles[i], False) or self.starts[i]
+        ranked = sorted(found, key=lambda t: (not found[t], t))
+        return ranked[:k]
+
+    def _text_matches(self, text, k):
+        cursor = self.mongo.courses.find({"$text": {"$search": text}}, {"title": 1, "score": {"$meta": "textScore"}})
+        return [doc["title"] for doc in cursor.sort([("score", {"$meta": "textScore"})]).limit(k)]
+
+    def complete(self, text, k=None):
+        """ Regresa hasta k títulos que coinciden con el texto tecleado. """
+        k = k or self.top_k
+        if time.monotonic() - self.checked_at > self.refresh_interval:
+            self.refresh()
+        prefix = normalize_title(text)
+        if not prefix:
+            return []
+        return self._prefix_matches(prefix, k) or self._text_matches(text, k)
+
+
+_autocomplete = None
+
+def init_autocomplete(completer):
+    """ Registra el autocompletado de títulos que usa seleccionar_curso. """
+    global _autocomplete
+    _autocomplete = completer
+    return _autocomplete
+
+def get_autocomplete():
+    return _autocomplete
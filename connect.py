@@ -1,15 +1,24 @@
 import pymongo
 import cassandra.cluster
+import cassandra.policies
 import pydgraph
+from dgraph_client import DgraphHTTPClient
 
 def connect_mongo(uri="mongodb://127.0.0.1:27017"):
     return pymongo.MongoClient(uri).learnlink
 
 def connect_cassandra(hosts=["127.0.0.1"]):
-    cluster = cassandra.cluster.Cluster(hosts)
+    # Token-aware: las sentencias preparadas se envían a una réplica dueña de la partición.
+    profile = cassandra.cluster.ExecutionProfile(
+        load_balancing_policy=cassandra.policies.TokenAwarePolicy(cassandra.policies.DCAwareRoundRobinPolicy())
+    )
+    cluster = cassandra.cluster.Cluster(hosts, execution_profiles={cassandra.cluster.EXEC_PROFILE_DEFAULT: profile})
     session = cluster.connect("learnlink")
     return session
 
 def connect_dgraph(host="127.0.0.1:9080"):
     client_stub = pydgraph.DgraphClientStub(host)
-    return pydgraph.DgraphClient(client_stub)
\ No newline at end of file
+    return pydgraph.DgraphClient(client_stub)
+
+def connect_dgraph_http(url="http://127.0.0.1:8080", timeout=10.0, pool_size=10):
+    return DgraphHTTPClient(url, timeout=timeout, pool_size=pool_size)
@@ -0,0 +1,130 @@
+import time
+import argparse
+
+from cassandra.query import SimpleStatement, BatchStatement, BatchType
+
+from connect import connect_mongo, connect_cassandra
+from metrics import time_response_future
+from activity_buckets import ACTIVITY_BUCKETS, load_layout, is_bucketed
+
+#################################################################
+# CONTADORES DE INSCRIPCIONES POR CURSO Y ESTADO (CASSANDRA COUNTER)
+#################################################################
+# `course_enrollment_counts` guarda cuántos alumnos hay por (curso, estado)
+# para responder C10 con una lectura de una celda en lugar de un COUNT(*)
+# sobre la partición de course_activity. Los caminos de escritura
+# (inscripción y cambios de estado) lo incrementan; como un incremento que
+# expira por timeout pudo haberse aplicado, nunca se reintenta: cualquier
+# desviación la corrige reconcile(), que recalcula desde course_activity (o
+# desde course_activity_by_bucket después del corte a buckets).
+
+RECONCILE_FETCH_SIZE = 1000
+
+
+def _warn(course_title, status):
+    return lambda exc: print(f"ADVERTENCIA: contador de '{course_title}' [{status}] sin actualizar ({exc}); "
+                             "corregir con course_counters.py")
+
+
+def record_enrollment(cass, course_title, status='active'):
+    """ +1 al contador del estado inicial. No bloquea: el resultado solo se revisa para avisar si falló. """
+    future = cass.run_async("course_count_add", (1, course_title, status))
+    future.add_errback(_warn(course_title, status))
+    return future
+
+
+def record_status_change(cass, course_title, old_status, new_status):
+    """ Mueve un alumno de `old_status` a `new_status` (-1/+1 en un batch de contadores). """
+    batch = BatchStatement(batch_type=BatchType.COUNTER)
+    batch.add(cass.bind("course_count_add", (-1, course_title, old_status)))
+    batch.add(cass.bind("course_count_add", (1, course_title, new_status)))
+    future = time_response_future(cass.execute_async(batch), "course_count_move", time.perf_counter())
+    future.add_errback(_warn(course_title, f"{old_status}->{new_status}"))
+    return future
+
+
+def course_count(cass, course_title, status):
+    row = cass.run("course_count_get", (course_title, status)).one()
+    return row.students if row else 0
+
+
+def all_course_counts(cass):
+    """ {course_title: {status: alumnos}} para todos los cursos en una sola consulta (tabla pequeña: una fila por curso y estado). """
+    counts = {}
+    for r in cass.run("course_counts_all"):
+        counts.setdefault(r.course_title, {})[r.status] = r.students
+    return counts
+
+
+#################################################################
+# RECONCILIACIÓN DESDE course_activity
+#################################################################
+
+def _legacy_counts(session, fetch_size):
+    """ (títulos, función título -> {estado: alumnos}) leyendo course_activity. """
+    by_status = session.prepare("SELECT status, COUNT(*) AS n FROM course_activity WHERE course_title=? GROUP BY status")
+    titles = {r.course_title for r in session.execute(SimpleStatement("SELECT DISTINCT course_title FROM course_activity",
+                                                                       fetch_size=fetch_size))}
+    return titles, lambda title: {r.status: r.n for r in session.execute(by_status, (title,))}
+
+
+def _bucketed_counts(session, fetch_size):
+    """ Igual que _legacy_counts pero sumando los buckets de cada curso (consultados a la vez). """
+    by_status = session.prepare("SELECT status, COUNT(*) AS n FROM course_activity_by_bucket "
+                                "WHERE course_title=? AND bucket=? GROUP BY status")
+    titles = {r.course_title for r in session.execute(SimpleStatement("SELECT DISTINCT course_title, bucket FROM course_activity_by_bucket",
+                                                                       fetch_size=fetch_size))}
+
+    def counts(title):
+        actual = {}
+        futures = [session.execute_async(by_status, (title, bucket)) for bucket in range(ACTIVITY_BUCKETS)]
+        for future in futures:
+            for r in future.result():
+                actual[r.status] = actual.get(r.status, 0) + r.n
+        return actual
+    return titles, counts
+
+
+def reconcile(session, dry_run=False, fetch_size=RECONCILE_FETCH_SIZE):
+    """ Ajusta cada contador a lo que hay en course_activity sumándole la diferencia.
+
+    Recibe la sesión de Cassandra (no el registro) para poder correr desde
+    populate.py. Después del corte a buckets (activity_buckets.is_bucketed)
+    cuenta sobre course_activity_by_bucket. Regresa (cursos revisados,
+    [(curso, estado, contador, real)]). Una inscripción que llegue mientras
+    corre puede quedar contada dos veces o ninguna; basta con volver a ejecutarla.
+    """
+    titles, actual_counts = (_bucketed_counts if is_bucketed() else _legacy_counts)(session, fetch_size)
+    add = session.prepare("UPDATE course_enrollment_counts SET students = students + ? WHERE course_title=? AND status=?")
+
+    counters = {}
+    for r in session.execute(SimpleStatement("SELECT course_title, status, students FROM course_enrollment_counts",
+                                             fetch_size=fetch_size)):
+        counters.setdefault(r.course_title, {})[r.status] = r.students
+    titles.update(counters)
+
+    adjusted = []
+    for title in sorted(titles):
+        actual = actual_counts(title)
+        stored = counters.get(title, {})
+        for status in set(actual) | set(stored):
+            current = stored.get(status, 0)
+            real = actual.get(status, 0)
+            if current != real:
+                adjusted.append((title, status, current, real))
+                if not dry_run:
+                    session.execute(add, (real - current, title, status))
+    return len(titles), adjusted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula course_enrollment_counts desde course_activity (o sus buckets).")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar las diferencias")
+    args = parser.parse_args()
+
+    load_layout(connect_mongo())
+
+    courses, adjusted = reconcile(connect_cassandra(), dry_run=args.dry_run)
+    print(f"{courses} cursos revisados, {len(adjusted)} contadores {'con diferencias' if args.dry_run else 'ajustados'}.")
+    for title, status, current, real in adjusted[:50]:
+        print(f"  {title} [{status}]: {current} -> {real}")
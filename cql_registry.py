@@ -0,0 +1,112 @@
+import time
+from metrics import observe, time_response_future
+
+#################################################################
+# REGISTRO DE SENTENCIAS PREPARADAS (CASSANDRA)
+#################################################################
+
+# Todas las sentencias CQL que usa la aplicación. Se preparan una sola vez por
+# sesión; al ejecutarlas ligadas, el driver conoce la llave de partición
+# (email, role, course_title) y la política token-aware envía la petición
+# directamente a una réplica dueña del token.
+STATEMENTS = {
+    # --- Logs de sesión ---
+    "log_user_insert": "INSERT INTO logs_by_user (email, action, action_date, user_id, name, role) VALUES (?, ?, ?, ?, ?, ?)",
+    "user_event_insert": "INSERT INTO user_events (email, action_date, action, user_id, name, role) VALUES (?, ?, ?, ?, ?, ?)",
+    "user_events_between": "SELECT email, action, action_date FROM user_events WHERE email=? AND action_date >= ? AND action_date < ?",
+    "log_role_day_insert": "INSERT INTO logs_by_role_day (role, day, action_date, email, action, name, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "logs_by_user": "SELECT email, action, action_date FROM logs_by_user WHERE email=?",
+    "logs_by_user_action": "SELECT email, action, action_date FROM logs_by_user WHERE email=? AND action=?",
+    "logs_by_role_day": "SELECT email, name, action, action_date FROM logs_by_role_day WHERE role=? AND day=?",
+
+    # --- Portafolio del alumno ---
+    "portfolio_insert": "INSERT INTO student_portfolio (email, status, course_title, grade, course_id, user_id, name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "portfolio_delete": "DELETE FROM student_portfolio WHERE email=? AND status=? AND course_title=?",
+    "portfolio_by_student": "SELECT status, course_title, grade, course_id, user_id, name FROM student_portfolio WHERE email=?",
+    "portfolio_by_status": "SELECT course_title, grade FROM student_portfolio WHERE email=? AND status=?",
+
+    # --- Actividad por curso ---
+    "activity_insert": "INSERT INTO course_activity (course_title, status, grade, email, name, course_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "activity_delete": "DELETE FROM course_activity WHERE course_title=? AND status=? AND grade=? AND email=?",
+    "activity_by_status": "SELECT name, email, grade FROM course_activity WHERE course_title=? AND status=?",
+    "activity_below_grade": "SELECT name, email, grade FROM course_activity WHERE course_title=? AND status=? AND grade < ?",
+    "activity_count": "SELECT COUNT(*) FROM course_activity WHERE course_title=? AND status=?",
+
+    # --- Actividad por curso en buckets (course_title, bucket) ---
+    "activity_bucket_insert": "INSERT INTO course_activity_by_bucket (course_title, bucket, status, grade, email, name, course_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "activity_bucket_delete": "DELETE FROM course_activity_by_bucket WHERE course_title=? AND bucket=? AND status=? AND grade=? AND email=?",
+    "activity_bucket_by_status": "SELECT name, email, grade FROM course_activity_by_bucket WHERE course_title=? AND bucket=? AND status=?",
+    "activity_bucket_below_grade": "SELECT name, email, grade FROM course_activity_by_bucket WHERE course_title=? AND bucket=? AND status=? AND grade < ?",
+    "activity_bucket_count": "SELECT COUNT(*) FROM course_activity_by_bucket WHERE course_title=? AND bucket=? AND status=?",
+
+    # --- Contadores de alumnos por curso y estado ---
+    "course_count_add": "UPDATE course_enrollment_counts SET students = students + ? WHERE course_title=? AND status=?",
+    "course_count_get": "SELECT students FROM course_enrollment_counts WHERE course_title=? AND status=?",
+    "course_counts_all": "SELECT course_title, status, students FROM course_enrollment_counts",
+}
+
+
+class StatementRegistry:
+    """ Prepara todas las sentencias al iniciar y expone ejecuciones por nombre.
+
+    Cualquier otro atributo (execute, keyspace, cluster...) se delega a la
+    sesión original, así que el registro se puede pasar donde antes se
+    pasaba la sesión de Cassandra.
+    """
+
+    def __init__(self, session, statements=STATEMENTS):
+        self.session = session
+        self.prepared = {name: session.prepare(cql) for name, cql in statements.items()}
+
+    def bind(self, name, params=()):
+        return self.prepared[name].bind(params)
+
+    def _timed_execute(self, operation, statement, params, kwargs):
+        started = time.perf_counter()
+        try:
+            result = self.session.execute(statement, params, **kwargs)
+        except Exception:
+            observe("cassandra", operation, time.perf_counter() - started, error=True)
+            raise
+        observe("cassandra", operation, time.perf_counter() - started, rows=len(result.current_rows))
+        return result
+
+    def run(self, name, params=(), **kwargs):
+        """ Ejecuta de forma síncrona la sentencia `name` con los parámetros dados. """
+        return self._timed_execute(name, self.prepared[name], params, kwargs)
+
+    def run_page(self, name, params=(), fetch_size=100, paging_state=None):
+        """ Una sola página de `name`. Regresa (filas, paging_state para continuar o None si no hay más). """
+        statement = self.bind(name, params)
+        statement.fetch_size = fetch_size
+        result = self._timed_execute(name, statement, None, {"paging_state": paging_state})
+        return result.current_rows, result.paging_state
+
+    def iter_pages(self, name, params=(), fetch_size=100, paging_state=None):
+        """ Genera (filas, paging_state) de `name`, pidiendo cada página solo cuando se consume la anterior. """
+        while True:
+            rows, paging_state = self.run_page(name, params, fetch_size, paging_state)
+            yield rows, paging_state
+            if paging_state is None:
+                return
+
+    def iter_rows(self, name, params=(), fetch_size=100):
+        """ Filas de `name` sin materializar el resultado completo. """
+        for rows, _ in self.iter_pages(name, params, fetch_size):
+            yield from rows
+
+    def run_async(self, name, params=(), fetch_size=None, **kwargs):
+        """ Igual que run() pero regresa el ResponseFuture del driver. Con `fetch_size` el resultado se pagina. """
+        statement = self.prepared[name]
+        if fetch_size:
+            statement, params = self.bind(name, params), None
+            statement.fetch_size = fetch_size
+        started = time.perf_counter()
+        return time_response_future(self.session.execute_async(statement, params, **kwargs), name, started)
+
+    def execute(self, query, params=None, **kwargs):
+        """ session.execute con métricas, para CQL que no está en el registro. """
+        return self._timed_execute("execute", query, params, kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.session, attr)
@@ -0,0 +1,301 @@
+import json
+import time
+import random
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import observe
+
+#################################################################
+# CLIENTE HTTP DE DGRAPH
+#################################################################
+
+DGRAPH_HTTP_URL = "http://127.0.0.1:8080"
+DGRAPH_TIMEOUT = 10.0           # Deadline por operación (segundos)
+DGRAPH_CONNECT_TIMEOUT = 3.0    # Tiempo máximo para abrir el socket
+DGRAPH_POOL_SIZE = 10           # Conexiones keep-alive reutilizables
+DGRAPH_ABORT_RETRIES = 5        # Reintentos de una mutación abortada por conflicto
+DGRAPH_RETRY_BASE = 0.05        # Espera base (segundos) antes del primer reintento
+
+
+class DgraphHTTPClient:
+    """ Cliente de Dgraph sobre HTTP con sesión persistente y pool de conexiones.
+
+    Todas las llamadas reutilizan los sockets abiertos del pool (keep-alive), en
+    lugar de abrir una conexión TCP nueva por consulta, y siempre llevan un
+    deadline tanto en el cliente como en el servidor (parámetro `timeout`).
+    """
+
+    def __init__(self, url=DGRAPH_HTTP_URL, timeout=DGRAPH_TIMEOUT, pool_size=DGRAPH_POOL_SIZE,
+                 connect_timeout=DGRAPH_CONNECT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path, body, content_type, params, timeout):
+        deadline = timeout or self.timeout
+        params = dict(params)
+        # Dgraph aborta la operación del lado del servidor al vencer el deadline.
+        params["timeout"] = f"{int(deadline * 1000)}ms"
+        data = body.encode("utf-8")
+        started = time.perf_counter()
+        try:
+            res = self.session.post(
+                f"{self.url}{path}",
+                params=params,
+                data=data,
+                headers={"Content-Type": content_type},
+                timeout=(self.connect_timeout, deadline + 1)
+            )
+            res.raise_for_status()
+            result = res.json()
+        except (requests.exceptions.RequestException, ValueError):
+            observe("dgraph", path.lstrip("/"), time.perf_counter() - started, error=True, payload=len(data))
+            raise
+        observe("dgraph", path.lstrip("/"), time.perf_counter() - started,
+                error=bool(result.get("errors")), payload=len(data) + len(res.content))
+        return result
+
+    def query(self, query, read_only=True, best_effort=False, timeout=None):
+        """ Ejecuta una consulta DQL. `best_effort` solo aplica a transacciones de lectura. """
+        params = {}
+        if read_only:
+            params["ro"] = "true"
+            if best_effort:
+                params["be"] = "true"
+        return self._post("/query", query, "application/graphql+-", params, timeout)
+
+    def mutate(self, mutation_rdf, commit_now=True, timeout=None):
+        """ Ejecuta una mutación RDF (set/delete/upsert). """
+        params = {"commitNow": "true"} if commit_now else {}
+        return self._post("/mutate", mutation_rdf, "application/rdf", params, timeout)
+
+    def health(self):
+        """ Consulta el endpoint /health del Alpha. """
+        res = self.session.get(f"{self.url}/health", timeout=(self.connect_timeout, self.timeout))
+        res.raise_for_status()
+        return res.json()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+
+def init_client(client):
+    """ Registra el cliente que usarán todas las funciones del módulo. """
+    global _client
+    _client = client
+    return _client
+
+def get_client():
+    """ Regresa el cliente compartido, creándolo con la configuración por defecto si hace falta. """
+    global _client
+    if _client is None:
+        _client = DgraphHTTPClient()
+    return _client
+
+
+#################################################################
+# FUNCIONES GENÉRICAS (QUERY / MUTATE / BATCH)
+#################################################################
+
+def dgraph_run_query(query, best_effort=False, timeout=None):
+    """ Función genérica para ejecutar cualquier consulta DQL (Query) en una transacción de solo lectura.
+
+    Los reportes deben usar `best_effort=True`: Dgraph responde con la última
+    versión que tenga disponible sin pedir un timestamp a Zero.
+    """
+    try:
+        return get_client().query(query, read_only=True, best_effort=best_effort, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        print(f"Error de conexión con Dgraph: {e}")
+        return None
+    except json.JSONDecodeError:
+        print("Error: Dgraph no devolvió un JSON válido.")
+        return None
+
+def dgraph_run_batch(blocks, best_effort=False, timeout=None):
+    """ Ejecuta varios bloques DQL en una sola petición y regresa el diccionario `data`.
+
+    Cada elemento de `blocks` es un bloque con nombre, p. ej.
+    'c(func: type(Course)) { title }'. Los bloques `var` también se aceptan.
+    """
+    query = "{\n" + "\n".join(blocks) + "\n}"
+    res = dgraph_run_query(query, best_effort=best_effort, timeout=timeout)
+    if not res:
+        return None
+    if res.get("errors"):
+        print(f"Error en la consulta de Dgraph: {res['errors'][0]['message']}")
+        return None
+    return res.get("data", {})
+
+def dgraph_run_mutate(mutation_rdf, timeout=None, retries=0):
+    """ Función genérica para ejecutar cualquier mutación RDF en Dgraph.
+
+    Con `retries` > 0 la mutación se repite, con espera exponencial y jitter,
+    cuando Dgraph la aborta por conflicto con otra transacción concurrente
+    ("Transaction has been aborted"). Sirve para bloques upsert, que vuelven a
+    leer el estado en cada intento.
+    """
+    for attempt in range(retries + 1):
+        try:
+            data = get_client().mutate(mutation_rdf, commit_now=True, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error de conexión con Dgraph (mutación): {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"Error al parsear la respuesta de Dgraph (mutación): {e}")
+            return None
+
+        if not data.get("errors"):
+            return data.get("data", {}).get("uids", {})
+
+        message = data["errors"][0]["message"]
+        if "Transaction has been aborted" not in message or attempt == retries:
+            print(f"Error en la mutación de Dgraph: {message}")
+            return None
+        time.sleep(random.uniform(0, DGRAPH_RETRY_BASE * 2 ** attempt))
+
+
+#################################################################
+# FUNCIONES DE DOMINIO
+#################################################################
+
+def dql_escape(value):
+    """ Escapa `\\` y `"` para interpolar un valor dentro de una cadena DQL ("..."). """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def dgraph_get_uid_by_email(email):
+    """ Busca el UID de un User o Instructor en Dgraph usando su email. """
+    query = f"""
+    {{
+      user(func: eq(email, "{dql_escape(email)}")) {{
+        uid
+      }}
+    }}
+    """
+    data = dgraph_run_query(query)
+    if not data:
+        return None
+    users = data.get("data", {}).get("user", [])
+    return users[0]["uid"] if users else None
+
+def dgraph_get_uid_by_title(title):
+    """ Busca el UID de un Curso en Dgraph usando su título. """
+    q = f'''
+    {{
+      course(func: eq(title, "{dql_escape(title)}")) {{
+        uid
+      }}
+    }}
+    '''
+    data = dgraph_run_query(q)
+    if not data:
+        return None
+    courses = data.get("data", {}).get("course", [])
+    return courses[0]["uid"] if courses else None
+
+# Contadores desnormalizados en los nodos Course (D2/D5). Se actualizan en la
+# misma transacción que la matrícula/reseña mediante un bloque upsert. Dos
+# escrituras simultáneas sobre el mismo curso chocan en el contador y Dgraph
+# aborta una de ellas, así que esos upserts se reintentan (DGRAPH_ABORT_RETRIES).
+COURSE_COUNTERS = ("enrollment_count", "review_count", "rating_sum")
+COUNTER_REPAIR_PAGE = 1000
+
+def _course_counter_upsert(course_uid, deltas, set_nquads="", delete_nquads=""):
+    """ Bloque upsert que aplica `deltas` ({predicado: incremento}) a un curso junto con la mutación dada.
+
+    Si el curso todavía no tiene el contador se inicializa con el incremento
+    (solo para incrementos positivos).
+    """
+    query, mutations = [], []
+    if set_nquads:
+        mutations.append(f"mutation {{ set {{ {set_nquads} }} }}")
+    if delete_nquads:
+        mutations.append(f"mutation {{ delete {{ {delete_nquads} }} }}")
+    for k, (pred, delta) in enumerate(deltas.items()):
+        op = "+" if delta >= 0 else "-"
+        query.append(f"c{k} as var(func: uid({course_uid})) @filter(has({pred})) {{ v{k} as {pred} n{k} as math(v{k} {op} {abs(delta)}) }}")
+        mutations.append(f"mutation @if(eq(len(c{k}), 1)) {{ set {{ uid(c{k}) <{pred}> val(n{k}) . }} }}")
+        if delta > 0:
+            mutations.append(f'mutation @if(eq(len(c{k}), 0)) {{ set {{ <{course_uid}> <{pred}> "{delta}" . }} }}')
+    return "upsert {\n  query {\n    " + "\n    ".join(query) + "\n  }\n  " + "\n  ".join(mutations) + "\n}"
+
+def dgraph_insert_enrollment(user_uid, course_uid, enroll_date):
+    """ Inserta una nueva matrícula en Dgraph e incrementa enrollment_count del curso. """
+    safe_date = enroll_date.replace('"', "'")
+    nquads = f"""
+        _:newenroll <dgraph.type> "Enrollment" .
+        _:newenroll <status> "active" .
+        _:newenroll <of_course> <{course_uid}> .
+        _:newenroll <enroll_date> "{safe_date}" .
+        <{user_uid}> <enrolled_in> _:newenroll .
+    """
+    uids = dgraph_run_mutate(_course_counter_upsert(course_uid, {"enrollment_count": 1}, set_nquads=nquads),
+                             retries=DGRAPH_ABORT_RETRIES)
+    if uids:
+        return uids.get("newenroll")
+    return None
+
+def dgraph_delete_enrollment(user_uid, enroll_uid, course_uid):
+    """ Elimina una matrícula de Dgraph (nodo y arista enrolled_in) y descuenta enrollment_count. Se usa como compensación. """
+    nquads = f"""
+        <{user_uid}> <enrolled_in> <{enroll_uid}> .
+        <{enroll_uid}> * * .
+    """
+    upsert = _course_counter_upsert(course_uid, {"enrollment_count": -1}, delete_nquads=nquads)
+    return dgraph_run_mutate(upsert, retries=DGRAPH_ABORT_RETRIES) is not None
+
+def dgraph_insert_review(comment, rating, user_uid, course_uid):
+    """ Inserta una nueva reseña en Dgraph y actualiza review_count/rating_sum del curso. """
+    safe_comment = comment.replace('"', "'")
+    nquads = f"""
+        _:newreview <dgraph.type> "Review" .
+        _:newreview <comment> "{safe_comment}" .
+        _:newreview <rating> "{float(rating)}" .
+        _:newreview <review_of> <{course_uid}> .
+        _:newreview <reviewed_by> <{user_uid}> .
+    """
+    deltas = {"review_count": 1, "rating_sum": float(rating)}
+    uids = dgraph_run_mutate(_course_counter_upsert(course_uid, deltas, set_nquads=nquads), retries=DGRAPH_ABORT_RETRIES)
+    if uids:
+        return uids.get("newreview")
+    return None
+
+def dgraph_repair_course_counters(page_size=COUNTER_REPAIR_PAGE):
+    """ Recalcula enrollment_count, review_count y rating_sum de todos los cursos a partir de las aristas.
+
+    Regresa el número de cursos actualizados, o None si Dgraph falló.
+    """
+    repaired = 0
+    after = ""
+    while True:
+        data = dgraph_run_batch([f"""c(func: type(Course), first: {page_size}{after}) {{
+          uid
+          ne: count(~of_course)
+          nr: count(~review_of)
+          ~review_of {{ r as rating }}
+          rs: sum(val(r))
+        }}"""])
+        if data is None:
+            return None
+        courses = data.get("c", [])
+        if not courses:
+            return repaired
+
+        nquads = "\n".join(
+            f'<{c["uid"]}> <enrollment_count> "{c.get("ne", 0)}" .\n'
+            f'<{c["uid"]}> <review_count> "{c.get("nr", 0)}" .\n'
+            f'<{c["uid"]}> <rating_sum> "{float(c.get("rs", 0) or 0)}" .'
+            for c in courses
+        )
+        if dgraph_run_mutate(f"{{ set {{ {nquads} }} }}") is None:
+            return None
+        repaired += len(courses)
+        if len(courses) < page_size:
+            return repaired
+        after = f", after: {courses[-1]['uid']}"
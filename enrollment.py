@@ -0,0 +1,134 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from dgraph_client import dgraph_insert_enrollment, dgraph_delete_enrollment
+from identity_map import resolve_user_uid, resolve_course_uid
+from metrics import propagate
+from activity_buckets import activity_bucket, writes_legacy
+from course_counters import record_enrollment
+
+#################################################################
+# PIPELINE CONCURRENTE DE INSCRIPCIÓN (MONGO + CASSANDRA + DGRAPH)
+#################################################################
+
+ENROLLMENT_WORKERS = 8      # Por omisión; el servidor lo dimensiona con init_executor()
+TASKS_PER_ENROLLMENT = 3    # Tareas simultáneas de una inscripción en el pool (Mongo + 2 UIDs / Dgraph)
+
+_executor = None
+
+
+class EnrollmentError(Exception):
+    """ La inscripción no se pudo completar; los cambios parciales ya fueron revertidos. """
+
+
+class DuplicateEnrollmentError(EnrollmentError):
+    """ El alumno ya está (o estuvo) inscrito en el curso. """
+
+
+def init_executor(workers=ENROLLMENT_WORKERS):
+    """ Crea el pool de la inscripción para `workers` inscripciones simultáneas (cada una usa varias tareas). """
+    global _executor
+    old, _executor = _executor, ThreadPoolExecutor(max_workers=workers * TASKS_PER_ENROLLMENT,
+                                                   thread_name_prefix="inscripcion")
+    if old is not None:
+        old.shutdown(wait=False)
+    return _executor
+
+def get_executor():
+    if _executor is None:
+        init_executor()
+    return _executor
+
+
+def _submit(fn, *args):
+    """ Envía al pool conservando la etiqueta de acción de métricas del hilo que llama. """
+    return get_executor().submit(propagate(fn), *args)
+
+
+def _wait(future):
+    """ Espera un Future (concurrent o ResponseFuture de Cassandra) y regresa (ok, resultado/error). """
+    try:
+        return True, future.result()
+    except Exception as e:
+        return False, e
+
+
+def run_enrollment(mongo, cass, user, course_title, course_uuid, enroll_date):
+    """ Inscribe a `user` en el curso en las tres bases con escrituras concurrentes.
+
+    Fase 1: el insert en Mongo (que valida duplicados con el índice único)
+    corre en paralelo con la resolución de UIDs en Dgraph.
+    Fase 2: los inserts de Cassandra (execute_async, incluida la copia en buckets; course_activity
+    solo antes del corte a buckets) y la mutación de Dgraph se lanzan a la vez.
+    Si cualquier escritura falla se ejecutan los deletes compensatorios en las
+    demás bases y se lanza EnrollmentError. Regresa el UID de la matrícula en Dgraph,
+    o None si el usuario o el curso no existen en Dgraph: como antes, la
+    inscripción queda solo en Mongo y Cassandra y el llamador avisa.
+    """
+    email = user["email"]
+    bucket = activity_bucket(email)
+    user_id = uuid.UUID(user["user_uuid"])
+    course_id = uuid.UUID(course_uuid)
+    mongo_id = ObjectId()
+
+    # --- Fase 1: gate de Mongo + lecturas de Dgraph ---
+    f_mongo = _submit(mongo.enrollments.insert_one, {
+        "_id": mongo_id,
+        "user_email": email,
+        "course_title": course_title,
+        "enroll_date": enroll_date
+    })
+    f_user_uid = _submit(resolve_user_uid, email)
+    f_course_uid = _submit(resolve_course_uid, course_title)
+
+    mongo_ok, mongo_res = _wait(f_mongo)
+    _, user_uid = _wait(f_user_uid)
+    _, course_uid = _wait(f_course_uid)
+
+    if not mongo_ok:
+        if "E11000" in str(mongo_res):
+            raise DuplicateEnrollmentError(f"Ya estás o has estado inscrito en '{course_title}'.")
+        raise EnrollmentError(f"Error en Mongo: {mongo_res}")
+
+    in_dgraph = isinstance(user_uid, str) and isinstance(course_uid, str)
+
+    # --- Fase 2: escrituras independientes en paralelo ---
+    f_portfolio = cass.run_async("portfolio_insert", (email, 'active', course_title, 0.0, course_id, user_id, user['name']))
+    f_activity = None
+    if writes_legacy():
+        f_activity = cass.run_async("activity_insert", (course_title, 'active', 0.0, email, user['name'], course_id, user_id))
+    f_bucket = cass.run_async("activity_bucket_insert", (course_title, bucket, 'active', 0.0, email, user['name'], course_id, user_id))
+    f_dgraph = _submit(dgraph_insert_enrollment, user_uid, course_uid, enroll_date) if in_dgraph else None
+
+    portfolio_ok, portfolio_res = _wait(f_portfolio)
+    activity_ok, activity_res = _wait(f_activity) if f_activity else (True, None)
+    bucket_ok, bucket_res = _wait(f_bucket)
+    dgraph_ok, enroll_uid = _wait(f_dgraph) if f_dgraph else (True, None)
+    dgraph_ok = dgraph_ok and (bool(enroll_uid) or not in_dgraph)
+
+    if portfolio_ok and activity_ok and bucket_ok and dgraph_ok:
+        record_enrollment(cass, course_title)
+        return enroll_uid
+
+    # --- Compensación: deshacer lo que sí se escribió ---
+    failed = []
+    if not portfolio_ok: failed.append(f"student_portfolio ({portfolio_res})")
+    if not activity_ok: failed.append(f"course_activity ({activity_res})")
+    if not bucket_ok: failed.append(f"course_activity_by_bucket ({bucket_res})")
+    if not dgraph_ok: failed.append("Dgraph")
+
+    undo = [_submit(mongo.enrollments.delete_one, {"_id": mongo_id})]
+    if portfolio_ok:
+        undo.append(cass.run_async("portfolio_delete", (email, 'active', course_title)))
+    if activity_ok and f_activity:
+        undo.append(cass.run_async("activity_delete", (course_title, 'active', 0.0, email)))
+    if bucket_ok:
+        undo.append(cass.run_async("activity_bucket_delete", (course_title, bucket, 'active', 0.0, email)))
+    if dgraph_ok and enroll_uid:
+        undo.append(_submit(dgraph_delete_enrollment, user_uid, enroll_uid, course_uid))
+
+    undo_errors = [str(res) for ok, res in map(_wait, undo) if not ok or res is False]
+    msg = "Falló la inscripción en: " + ", ".join(failed) + "."
+    if undo_errors:
+        msg += " ADVERTENCIA: no se pudieron revertir todos los cambios: " + "; ".join(undo_errors)
+    raise EnrollmentError(msg)
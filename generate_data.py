@@ -0,0 +1,296 @@
+import os
+import json
+import uuid
+import bisect
+import random
+import hashlib
+import argparse
+from datetime import date, datetime, timedelta
+
+#################################################################
+# GENERADOR DE DATOS SINTÉTICOS DE LEARNLINK
+#################################################################
+# Escribe data/mongo_data.json, data/cassandra_data.json y data/dgraph_data.rdf
+# con los mismos formatos que espera populate.py. Toda la actividad de un
+# alumno se deriva de (seed, índice del alumno), así que cada archivo se
+# puede escribir en streaming regenerando la actividad sin guardarla en RAM.
+
+FIRST_NAMES = ["Ana", "Juan", "Sofía", "Diego", "Valentina", "Carlos", "Lucía", "Mateo", "Camila", "Emilio",
+               "Regina", "Santiago", "Renata", "Leonardo", "Ximena", "Andrés", "Fernanda", "Pablo", "Daniela", "Iván"]
+LAST_NAMES = ["Torres", "Pérez", "López", "Ramírez", "Fernández", "Ruiz", "Gómez", "Hernández", "Martínez", "Castro",
+              "Morales", "Vargas", "Ortiz", "Navarro", "Romero", "Silva", "Mendoza", "Rojas", "Flores", "Aguilar"]
+CATEGORIES = ["Tecnología", "Arte", "Matemáticas", "Ciencias", "Negocios", "Idiomas", "Humanidades", "Salud"]
+TOPICS = ["Programación", "Bases de Datos", "Diseño Gráfico", "Historia del Arte", "Cálculo", "Álgebra Lineal",
+          "Física", "Química", "Finanzas", "Marketing", "Inglés", "Filosofía", "Nutrición", "Estadística",
+          "Redes", "Inteligencia Artificial"]
+COMMENTS = ["Excelente curso.", "Muy retador pero valió la pena.", "El profesor explica muy bien.",
+            "Demasiado difícil para mí.", "Buen material, pocas prácticas.", "Lo recomiendo ampliamente.",
+            "Regular, esperaba más.", "Me encantó la parte práctica."]
+
+STUDENT_PASSWORD = hashlib.sha256(b"12345678").hexdigest()
+ADMIN_PASSWORD = hashlib.sha256(b"1234").hexdigest()
+START_DATE = date(2024, 1, 1)
+DATE_SPAN_DAYS = 730
+
+
+def stable_uuid(seed, kind, i):
+    """ UUID v4 determinista para (seed, tipo, índice). """
+    return str(uuid.UUID(bytes=hashlib.md5(f"{seed}:{kind}:{i}".encode()).digest(), version=4))
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+class LearnLinkGenerator:
+    """ Genera usuarios, cursos, inscripciones, reseñas y logs de forma determinista. """
+
+    def __init__(self, users, instructors, courses, enrollments, reviews, logs, lessons_per_course=3, skew=1.1, seed=42):
+        self.users = users
+        self.instructors = max(1, instructors)
+        self.courses = courses
+        self.enrollments = min(enrollments, users * courses)
+        self.review_rate = min(1.0, reviews / self.enrollments) if self.enrollments else 0.0
+        self.logs = logs
+        self.lessons_per_course = lessons_per_course
+        self.seed = seed
+
+        # Popularidad tipo Zipf: el curso k recibe un peso 1 / k^skew.
+        cum, total = [], 0.0
+        for k in range(1, courses + 1):
+            total += 1.0 / (k ** skew)
+            cum.append(total)
+        self.cum_weights = cum
+
+    # --- Entidades base ---
+
+    def user(self, i):
+        rng = random.Random(f"{self.seed}:user:{i}")
+        return {
+            "name": person_name(rng),
+            "email": f"alumno{i}@learnlink.mx",
+            "password": STUDENT_PASSWORD,
+            "role": "student",
+            "user_uuid": stable_uuid(self.seed, "user", i),
+        }
+
+    def instructor(self, j):
+        rng = random.Random(f"{self.seed}:instructor:{j}")
+        return {
+            "name": f"Mtro. {person_name(rng)}",
+            "email": f"instructor{j}@learnlink.mx",
+            "password": STUDENT_PASSWORD,
+            "role": "instructor",
+            "user_uuid": stable_uuid(self.seed, "instructor", j),
+        }
+
+    def instructor_of(self, k):
+        return (k - 1) % self.instructors + 1
+
+    def course(self, k):
+        rng = random.Random(f"{self.seed}:course:{k}")
+        return {
+            "title": f"{rng.choice(TOPICS)} {k}",
+            "category": rng.choice(CATEGORIES),
+            "instructor_email": f"instructor{self.instructor_of(k)}@learnlink.mx",
+            "course_uuid": stable_uuid(self.seed, "course", k),
+        }
+
+    def lesson(self, k, n, course_title):
+        return {
+            "title": f"Lección {n} de {course_title}",
+            "course_title": course_title,
+            "description": f"Contenido de la sesión {n}.",
+            "url": f"https://learnlink.mx/cursos/{k}/leccion{n}",
+        }
+
+    # --- Actividad por alumno ---
+
+    def _share(self, total, i):
+        """ Reparte `total` entre los usuarios: base común + 1 para los primeros `resto`. """
+        base, extra = divmod(total, self.users)
+        return base + (1 if i <= extra else 0)
+
+    def activity(self, i):
+        """ Inscripciones (con reseña opcional) y eventos de log del alumno i. """
+        rng = random.Random(f"{self.seed}:activity:{i}")
+        wanted = min(self._share(self.enrollments, i), self.courses)
+
+        chosen, attempts = [], 0
+        seen = set()
+        while len(chosen) < wanted and attempts < wanted * 20:
+            k = bisect.bisect_left(self.cum_weights, rng.random() * self.cum_weights[-1]) + 1
+            attempts += 1
+            if k not in seen:
+                seen.add(k)
+                chosen.append(k)
+        k = 1
+        while len(chosen) < wanted:
+            if k not in seen:
+                seen.add(k)
+                chosen.append(k)
+            k += 1
+
+        enrollments = []
+        for k in chosen:
+            day = START_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+            completed = rng.random() < 0.6
+            grade = round(rng.uniform(4.0, 10.0), 1) if completed else None
+            review = None
+            if rng.random() < self.review_rate:
+                review = {"comment": rng.choice(COMMENTS), "rating": float(rng.randint(1, 10))}
+            enrollments.append({"course": k, "date": day.isoformat(),
+                                "status": "completed" if completed else "active",
+                                "grade": grade, "review": review})
+
+        logs = []
+        n_logs = self._share(self.logs, i)
+        moment = datetime.combine(START_DATE, datetime.min.time()) + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        for n in range(n_logs):
+            action = "log_in" if n % 2 == 0 else "log_out"
+            moment += timedelta(minutes=rng.randint(20, 180)) if action == "log_out" else timedelta(hours=rng.randint(1, 72))
+            logs.append({"action": action, "action_date": moment.strftime("%Y-%m-%dT%H:%M:%S")})
+        return enrollments, logs
+
+
+#################################################################
+# ESCRITURA EN STREAMING
+#################################################################
+
+def write_json_sections(path, sections):
+    """ Escribe {"llave": [...], ...} elemento por elemento; `sections` es una lista de (llave, iterador). """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for idx, (key, items) in enumerate(sections):
+            f.write(f'  "{key}": [')
+            sep = "\n    "
+            for item in items:
+                f.write(sep + json.dumps(item, ensure_ascii=False))
+                sep = ",\n    "
+            f.write("\n  ]" + ("," if idx < len(sections) - 1 else "") + "\n")
+        f.write("}\n")
+
+
+def mongo_sections(gen):
+    def users():
+        yield {"name": "admin", "email": "admin", "password": ADMIN_PASSWORD, "role": "admin",
+               "user_uuid": stable_uuid(gen.seed, "admin", 0)}
+        for i in range(1, gen.users + 1):
+            yield gen.user(i)
+        for j in range(1, gen.instructors + 1):
+            yield gen.instructor(j)
+
+    def courses():
+        for k in range(1, gen.courses + 1):
+            yield gen.course(k)
+
+    def lessons():
+        for k in range(1, gen.courses + 1):
+            title = gen.course(k)["title"]
+            for n in range(1, gen.lessons_per_course + 1):
+                yield gen.lesson(k, n, title)
+
+    def enrollments():
+        for i in range(1, gen.users + 1):
+            email = gen.user(i)["email"]
+            for e in gen.activity(i)[0]:
+                yield {"user_email": email, "course_title": gen.course(e["course"])["title"], "enroll_date": e["date"]}
+
+    def reviews():
+        for i in range(1, gen.users + 1):
+            name = gen.user(i)["name"]
+            for e in gen.activity(i)[0]:
+                if e["review"]:
+                    yield {"course_title": gen.course(e["course"])["title"], "username": name, **e["review"]}
+
+    return [("users", users()), ("courses", courses()), ("lessons", lessons()),
+            ("enrollments", enrollments()), ("reviews", reviews())]
+
+
+def cassandra_sections(gen):
+    def logs():
+        for i in range(1, gen.users + 1):
+            u = gen.user(i)
+            for log in gen.activity(i)[1]:
+                yield {"user_id": u["user_uuid"], "email": u["email"], "name": u["name"], "role": "student", **log}
+
+    def course_rows():
+        for i in range(1, gen.users + 1):
+            u = gen.user(i)
+            for e in gen.activity(i)[0]:
+                c = gen.course(e["course"])
+                yield {"user_id": u["user_uuid"], "course_id": c["course_uuid"], "course_title": c["title"],
+                       "email": u["email"], "name": u["name"], "status": e["status"], "grade": e["grade"]}
+
+    return [("logging_info_by_email", logs()), ("course_info_by_status", course_rows())]
+
+
+def write_dgraph(path, gen):
+    q = lambda value: json.dumps(value, ensure_ascii=False)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# ---------- INSTRUCTORS ----------\n")
+        for j in range(1, gen.instructors + 1):
+            inst = gen.instructor(j)
+            f.write(f'_:i{j} <dgraph.type> "Instructor" .\n_:i{j} <name> {q(inst["name"])} .\n'
+                    f'_:i{j} <email> {q(inst["email"])} .\n_:i{j} <role> "instructor" .\n')
+            for k in range(j, gen.courses + 1, gen.instructors):
+                f.write(f"_:i{j} <teaches> _:c{k} .\n")
+
+        f.write("\n# ---------- COURSES ----------\n")
+        for k in range(1, gen.courses + 1):
+            c = gen.course(k)
+            f.write(f'_:c{k} <dgraph.type> "Course" .\n_:c{k} <title> {q(c["title"])} .\n_:c{k} <category> {q(c["category"])} .\n')
+
+        f.write("\n# ---------- USERS, ENROLLMENTS Y REVIEWS ----------\n")
+        e_id = r_id = 0
+        for i in range(1, gen.users + 1):
+            u = gen.user(i)
+            f.write(f'_:u{i} <dgraph.type> "User" .\n_:u{i} <name> {q(u["name"])} .\n'
+                    f'_:u{i} <email> {q(u["email"])} .\n_:u{i} <role> "student" .\n')
+            for e in gen.activity(i)[0]:
+                e_id += 1
+                f.write(f'_:e{e_id} <dgraph.type> "Enrollment" .\n_:e{e_id} <status> "{e["status"]}" .\n')
+                if e["grade"] is not None:
+                    f.write(f'_:e{e_id} <grade> "{e["grade"]}" .\n')
+                f.write(f'_:e{e_id} <of_course> _:c{e["course"]} .\n_:e{e_id} <enroll_date> "{e["date"]}" .\n'
+                        f"_:u{i} <enrolled_in> _:e{e_id} .\n")
+                if e["review"]:
+                    r_id += 1
+                    f.write(f'_:r{r_id} <dgraph.type> "Review" .\n_:r{r_id} <comment> {q(e["review"]["comment"])} .\n'
+                            f'_:r{r_id} <rating> "{e["review"]["rating"]}" .\n'
+                            f"_:r{r_id} <review_of> _:c{e['course']} .\n_:r{r_id} <reviewed_by> _:u{i} .\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un dataset sintético consistente para MongoDB, Cassandra y Dgraph.")
+    parser.add_argument("--users", type=int, default=1000, help="Número de alumnos")
+    parser.add_argument("--instructors", type=int, default=None, help="Número de instructores (default: users/50)")
+    parser.add_argument("--courses", type=int, default=100, help="Número de cursos")
+    parser.add_argument("--enrollments", type=int, default=5000, help="Número total de inscripciones")
+    parser.add_argument("--reviews", type=int, default=1000, help="Número aproximado de reseñas")
+    parser.add_argument("--logs", type=int, default=10000, help="Número total de eventos de login/logout")
+    parser.add_argument("--lessons-per-course", type=int, default=3)
+    parser.add_argument("--skew", type=float, default=1.1, help="Exponente Zipf de popularidad de cursos (0 = uniforme)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="data", help="Directorio de salida")
+    args = parser.parse_args()
+
+    gen = LearnLinkGenerator(
+        users=args.users,
+        instructors=args.instructors if args.instructors is not None else max(1, args.users // 50),
+        courses=args.courses,
+        enrollments=args.enrollments,
+        reviews=args.reviews,
+        logs=args.logs,
+        lessons_per_course=args.lessons_per_course,
+        skew=args.skew,
+        seed=args.seed,
+    )
+    os.makedirs(args.out, exist_ok=True)
+
+    print("Escribiendo mongo_data.json...")
+    write_json_sections(os.path.join(args.out, "mongo_data.json"), mongo_sections(gen))
+    print("Escribiendo cassandra_data.json...")
+    write_json_sections(os.path.join(args.out, "cassandra_data.json"), cassandra_sections(gen))
+    print("Escribiendo dgraph_data.rdf...")
+    write_dgraph(os.path.join(args.out, "dgraph_data.rdf"), gen)
+    print("Listo.")
@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from dgraph_client import dgraph_run_batch, dgraph_get_uid_by_email, dgraph_get_uid_by_title
+
+#################################################################
+# MAPA DE IDENTIDAD ENTRE BASES DE DATOS
+#################################################################
+
+IDENTITY_MAX_ENTRIES = 50000    # Entradas máximas por tipo (usuarios / cursos)
+
+
+class _LinkedLRU:
+    """ Diccionario LRU acotado con índices secundarios por campo.
+
+    La llave primaria (email o título) apunta a un dict con los identificadores
+    de las otras bases; cada campo indexado permite la búsqueda inversa.
+    """
+
+    def __init__(self, max_entries, fields):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.index = {f: {} for f in fields}
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def find(self, field, value):
+        key = self.index[field].get(value)
+        return (key, self.get(key)) if key is not None else (None, None)
+
+    def put(self, key, **values):
+        entry = self.entries.get(key, {})
+        for field, value in values.items():
+            if value is None:
+                continue
+            old = entry.get(field)
+            if old is not None and old != value:
+                self.index[field].pop(old, None)
+            entry[field] = value
+            self.index[field][value] = key
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            old_key, old_entry = self.entries.popitem(last=False)
+            for field, value in old_entry.items():
+                self.index[field].pop(value, None)
+            self.evictions += 1
+
+
+class IdentityMap:
+    """ Relaciona email ↔ user_uuid ↔ uid de Dgraph y título ↔ course_uuid ↔ uid de Dgraph. """
+
+    def __init__(self, max_entries=IDENTITY_MAX_ENTRIES):
+        self.users = _LinkedLRU(max_entries, ("user_uuid", "uid"))
+        self.courses = _LinkedLRU(max_entries, ("course_uuid", "uid"))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def put_user(self, email, user_uuid=None, uid=None):
+        with self._lock:
+            self.users.put(email, user_uuid=user_uuid, uid=uid)
+
+    def put_course(self, title, course_uuid=None, uid=None):
+        with self._lock:
+            self.courses.put(title, course_uuid=course_uuid, uid=uid)
+
+    def _cached(self, lru, key, field):
+        with self._lock:
+            entry = lru.get(key)
+            if entry and entry.get(field):
+                self.hits += 1
+                return entry[field]
+            self.misses += 1
+            return None
+
+    def user_uid(self, email):
+        return self._cached(self.users, email, "uid")
+
+    def course_uid(self, title):
+        return self._cached(self.courses, title, "uid")
+
+    def email_by_uuid(self, user_uuid):
+        with self._lock:
+            return self.users.find("user_uuid", user_uuid)[0]
+
+    def title_by_uuid(self, course_uuid):
+        with self._lock:
+            return self.courses.find("course_uuid", course_uuid)[0]
+
+    def warm(self, mongo):
+        """ Carga masiva inicial desde Mongo (uuids) y Dgraph (uids). Regresa el total de llaves cargadas. """
+        limit = self.users.max_entries
+        for u in mongo.users.find({}, {"_id": 0, "email": 1, "user_uuid": 1}).limit(limit):
+            self.put_user(u["email"], user_uuid=u.get("user_uuid"))
+        for c in mongo.courses.find({}, {"_id": 0, "title": 1, "course_uuid": 1}).limit(limit):
+            self.put_course(c["title"], course_uuid=c.get("course_uuid"))
+
+        data = dgraph_run_batch([
+            f"u(func: has(email), first: {limit}) {{ uid email }}",
+            f"c(func: type(Course), first: {limit}) {{ uid title }}"
+        ], best_effort=True)
+        if data:
+            for u in data.get("u", []):
+                self.put_user(u["email"], uid=u["uid"])
+            for c in data.get("c", []):
+                self.put_course(c["title"], uid=c["uid"])
+        return len(self.users.entries) + len(self.courses.entries)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "users": len(self.users.entries),
+                "courses": len(self.courses.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.users.evictions + self.courses.evictions,
+            }
+
+
+_identity_map = None
+
+def init_identity_map(identity_map):
+    """ Registra el mapa de identidad compartido por el proceso. """
+    global _identity_map
+    _identity_map = identity_map
+    return _identity_map
+
+def get_identity_map():
+    global _identity_map
+    if _identity_map is None:
+        _identity_map = IdentityMap()
+    return _identity_map
+
+
+def resolve_user_uid(email):
+    """ UID de Dgraph de un usuario; solo consulta a Dgraph si no está en el mapa. """
+    identity = get_identity_map()
+    uid = identity.user_uid(email)
+    if uid is None:
+        uid = dgraph_get_uid_by_email(email)
+        if uid:
+            identity.put_user(email, uid=uid)
+    return uid
+
+def resolve_course_uid(title):
+    """ UID de Dgraph de un curso; solo consulta a Dgraph si no está en el mapa. """
+    identity = get_identity_map()
+    uid = identity.course_uid(title)
+    if uid is None:
+        uid = dgraph_get_uid_by_title(title)
+        if uid:
+            identity.put_course(title, uid=uid)
+    return uid
@@ -0,0 +1,122 @@
+import argparse
+import re
+
+import pymongo
+from pymongo import UpdateOne
+
+#################################################################
+# BÚSQUEDA DE LECCIONES (ÍNDICE DE TEXTO + TRIGRAMAS DE URL)
+#################################################################
+
+SEARCH_PAGE_SIZE = 10
+MIN_GRAM = 3
+URL_MAX_CANDIDATES = 5000   # Lecciones leídas como máximo por la vía de URL
+URL_PREFIX = re.compile(r"^[a-z][a-z0-9+.-]*://(www\.)?")
+
+
+def normalize_url(url):
+    """ URL en minúsculas sin esquema ni 'www.' (lo que se indexa y se compara). """
+    return URL_PREFIX.sub("", (url or "").strip().lower())
+
+
+def url_grams(url):
+    """ Trigramas distintos de la URL normalizada; cualquier subcadena de 3+ caracteres queda cubierta. """
+    s = normalize_url(url)
+    return sorted({s[i:i + MIN_GRAM] for i in range(len(s) - MIN_GRAM + 1)})
+
+
+def add_url_grams(lesson):
+    """ Agrega el campo `url_grams` a un documento de lección (in-place) y lo regresa. """
+    lesson["url_grams"] = url_grams(lesson.get("url"))
+    return lesson
+
+
+def lesson_document(title, course_title, description, url):
+    return add_url_grams({"title": title, "course_title": course_title, "description": description, "url": url})
+
+
+def ensure_lesson_indexes(db):
+    db.lessons.create_index([("title", pymongo.TEXT)])
+    db.lessons.create_index([("url_grams", pymongo.ASCENDING)])
+
+
+def backfill_url_grams(db, chunk_size=5000):
+    """ Calcula `url_grams` para las lecciones que aún no lo tienen. Regresa cuántas se actualizaron. """
+    updated = 0
+    ops = []
+    for doc in db.lessons.find({"url_grams": {"$exists": False}}, {"url": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"url_grams": url_grams(doc.get("url"))}}))
+        if len(ops) >= chunk_size:
+            updated += db.lessons.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.lessons.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+def _text_hits(db, term, limit):
+    """ Coincidencias en el título ordenadas por textScore. """
+    cursor = db.lessons.find(
+        {"$text": {"$search": term}},
+        {"title": 1, "course_title": 1, "url": 1, "score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return [(doc, float(doc.pop("score", 0))) for doc in cursor]
+
+
+def _rarest_gram(db, grams):
+    """ El trigrama con menos lecciones (conteos sobre el índice, topados en URL_MAX_CANDIDATES). """
+    return min(grams, key=lambda g: db.lessons.count_documents({"url_grams": g}, limit=URL_MAX_CANDIDATES))
+
+
+def _url_hits(db, term, limit):
+    """ Subcadenas de URL: candidatos del trigrama más raro (índice multikey) verificados en Python.
+
+    Con $all Mongo acota el índice por un solo trigrama, el primero en orden
+    alfabético, que suele ser de los más comunes; aquí se elige el más raro y
+    el resto se comprueba con la subcadena completa. Todos los candidatos
+    (hasta URL_MAX_CANDIDATES) se puntúan antes de cortar en `limit`. El score
+    es 1 + la fracción de la URL que cubre el término (coincidencias más exactas primero).
+    """
+    needle = normalize_url(term)
+    grams = url_grams(needle)
+    if not grams:
+        return []
+    hits = []
+    cursor = db.lessons.find({"url_grams": _rarest_gram(db, grams)},
+                             {"title": 1, "course_title": 1, "url": 1}).limit(URL_MAX_CANDIDATES)
+    for doc in cursor:
+        url = normalize_url(doc.get("url"))
+        if needle in url:
+            hits.append((doc, 1.0 + len(needle) / len(url)))
+    hits.sort(key=lambda x: (-x[1], x[0].get("title", "")))
+    return hits[:limit]
+
+
+def search_lessons(db, term, page=0, page_size=SEARCH_PAGE_SIZE):
+    """ Busca lecciones por título ($text) y por subcadena de URL (trigramas).
+
+    Regresa (filas, hay_mas) donde cada fila es (curso, lección, url, score)
+    ordenadas por relevancia; si una lección coincide por título y URL sus
+    scores se suman. Solo se leen (page + 1) * page_size + 1 candidatos por vía.
+    """
+    want = (page + 1) * page_size + 1
+    merged = {}
+    for doc, score in _text_hits(db, term, want) + _url_hits(db, term, want):
+        prev = merged.get(doc["_id"])
+        merged[doc["_id"]] = (doc, score + (prev[1] if prev else 0.0))
+
+    ranked = sorted(merged.values(), key=lambda x: (-x[1], x[0].get("title", "")))
+    start = page * page_size
+    rows = [(d.get("course_title"), d.get("title"), d.get("url"), s) for d, s in ranked[start:start + page_size]]
+    return rows, len(ranked) > start + page_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del índice de búsqueda de lecciones.")
+    parser.add_argument("--uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--db", default="learnlink")
+    args = parser.parse_args()
+
+    db = pymongo.MongoClient(args.uri)[args.db]
+    ensure_lesson_indexes(db)
+    print(f"Lecciones actualizadas con url_grams: {backfill_url_grams(db)}")
@@ -0,0 +1,217 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+
+import bson
+import numpy as np
+from pymongo import monitoring
+
+#################################################################
+# MÉTRICAS DE LATENCIA POR BASE (MONGO / CASSANDRA / DGRAPH)
+#################################################################
+# Cada llamada a una base se registra con las etiquetas (store, operation,
+# action): `action` es la opción de menú o ruta HTTP en curso, guardada en un
+# ContextVar. Se acumulan histogramas estilo Prometheus (buckets fijos), un
+# reservorio de las últimas muestras para percentiles en vivo, errores y
+# bytes de carga útil (Dgraph, y Mongo solo si se activa: medirlos obliga a
+# volver a serializar cada comando y respuesta; Cassandra reporta filas).
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RESERVOIR_SIZE = 1024
+EXPORT_PATH = "data/metrics.prom"
+EXPORT_INTERVAL = 15.0
+MONGO_PAYLOAD_BYTES = False     # Medir bytes BSON de cada comando de Mongo (re-serializa; solo para diagnóstico)
+
+_action = contextvars.ContextVar("metrics_action", default="-")
+
+
+def set_action(name):
+    """ Etiqueta las llamadas siguientes de este hilo/tarea con `name`. """
+    _action.set(name)
+
+def current_action():
+    return _action.get()
+
+def tracked(fn):
+    """ Decorador: las llamadas a bases dentro de `fn` llevan su nombre como acción. """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _action.set(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _action.reset(token)
+    return wrapper
+
+def propagate(fn):
+    """ Liga `fn` al contexto actual para ejecutarla en otro hilo (ThreadPoolExecutor no lo copia). """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+class Series:
+    """ Histograma + reservorio de una combinación de etiquetas. """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.payload_bytes = 0
+        self.rows = 0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, ms, error, payload, rows):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.errors += bool(error)
+        self.payload_bytes += payload
+        self.rows += rows
+        self.recent.append(ms)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, store, operation, seconds, error=False, payload=0, rows=0, action=None):
+        key = (store, operation, action or current_action())
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series()
+            series.observe(seconds * 1000, error, payload, rows)
+
+    def snapshot(self):
+        """ [(store, operation, action, count, errors, p50, p95, p99, bytes_promedio, filas)] con las muestras recientes. """
+        with self._lock:
+            items = [(k, s.count, s.errors, list(s.recent), s.payload_bytes, s.rows) for k, s in self.series.items()]
+        rows = []
+        for (store, operation, action), count, errors, recent, payload, n_rows in sorted(items):
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if recent else (0, 0, 0)
+            rows.append((store, operation, action, count, errors, float(p50), float(p95), float(p99),
+                         payload // count if count else 0, n_rows))
+        return rows
+
+    def to_prometheus(self):
+        """ Formato de exposición de texto de Prometheus. """
+        def labels(store, operation, action, le=None):
+            text = f'store="{store}",operation="{operation}",action="{action}"'
+            return text if le is None else f'{text},le="{le}"'
+
+        out = ["# HELP learnlink_db_latency_ms Latencia de llamadas a bases de datos.",
+               "# TYPE learnlink_db_latency_ms histogram"]
+        with self._lock:
+            items = sorted((k, s.buckets[:], s.count, s.sum_ms, s.errors, s.payload_bytes, s.rows)
+                           for k, s in self.series.items())
+        for (store, op, action), buckets, count, sum_ms, _, _, _ in items:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS_MS, buckets):
+                cumulative += n
+                out.append(f"learnlink_db_latency_ms_bucket{{{labels(store, op, action, bound)}}} {cumulative}")
+            out.append(f"learnlink_db_latency_ms_bucket{{{labels(store, op, action, '+Inf')}}} {count}")
+            out.append(f"learnlink_db_latency_ms_sum{{{labels(store, op, action)}}} {sum_ms:.3f}")
+            out.append(f"learnlink_db_latency_ms_count{{{labels(store, op, action)}}} {count}")
+        for name, idx, help_text in (("learnlink_db_errors_total", 4, "Llamadas que terminaron en error."),
+                                     ("learnlink_db_payload_bytes_total", 5, "Bytes enviados + recibidos (Dgraph; Mongo si MONGO_PAYLOAD_BYTES)."),
+                                     ("learnlink_db_rows_total", 6, "Filas leídas (Cassandra).")):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            out += [f"{name}{{{labels(*item[0])}}} {item[idx]}" for item in items]
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path=EXPORT_PATH):
+        """ Escritura atómica (archivo temporal + rename) para que el scraper nunca lea un archivo a medias. """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+_registry = MetricsRegistry()
+
+def get_metrics():
+    return _registry
+
+def observe(store, operation, seconds, error=False, payload=0, rows=0):
+    _registry.observe(store, operation, seconds, error, payload, rows)
+
+
+#################################################################
+# INSTRUMENTACIÓN
+#################################################################
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """ Registra cada comando de pymongo con su colección y, si `payload_bytes`, el tamaño BSON de petición + respuesta. """
+
+    def __init__(self, payload_bytes=MONGO_PAYLOAD_BYTES):
+        self.payload_bytes = payload_bytes
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        op = f"{event.command_name}:{collection}" if isinstance(collection, str) else event.command_name
+        size = len(bson.encode(event.command)) if self.payload_bytes else 0
+        self._pending[(event.connection_id, event.request_id)] = (op, size, current_action())
+
+    def _finish(self, event, error, reply_size):
+        op, request_size, action = self._pending.pop((event.connection_id, event.request_id), (event.command_name, 0, None))
+        _registry.observe("mongo", op, event.duration_micros / 1e6, error, request_size + reply_size, action=action)
+
+    def succeeded(self, event):
+        self._finish(event, False, len(bson.encode(event.reply)) if self.payload_bytes else 0)
+
+    def failed(self, event):
+        self._finish(event, True, 0)
+
+
+_installed = False
+
+def install_mongo_listener(payload_bytes=MONGO_PAYLOAD_BYTES):
+    """ Debe llamarse antes de crear el MongoClient (pymongo solo toma listeners globales al construirlo). """
+    global _installed
+    if not _installed:
+        monitoring.register(MongoMetricsListener(payload_bytes))
+        _installed = True
+
+
+def time_response_future(future, operation, started):
+    """ Registra un ResponseFuture de Cassandra al completarse (etiqueta de acción tomada al enviarlo). """
+    action = current_action()
+    future.add_callbacks(
+        lambda rows: _registry.observe("cassandra", operation, time.perf_counter() - started,
+                                       rows=len(rows) if isinstance(rows, list) else 0, action=action),
+        lambda exc: _registry.observe("cassandra", operation, time.perf_counter() - started, error=True, action=action))
+    return future
+
+
+class PrometheusExporter:
+    """ Hilo que reescribe el archivo de métricas cada `interval` segundos. """
+
+    def __init__(self, path=EXPORT_PATH, interval=EXPORT_INTERVAL, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or _registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.write_prometheus(self.path)
+            except OSError as e:
+                print(f"ADVERTENCIA: no se pudo escribir {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self.registry.write_prometheus(self.path)
@@ -1,10 +1,17 @@
 import json
+import argparse
 import pymongo
 import pydgraph
 import uuid
 import time
 from datetime import datetime
 from cassandra.cluster import Cluster
+import bulk_load
+from dgraph_client import dgraph_repair_course_counters
+from catalog import bump_catalog_version
+from lesson_search import add_url_grams, ensure_lesson_indexes
+from activity_buckets import activity_bucket, load_layout, writes_legacy
+from course_counters import reconcile
 
 # --- RUTAS A LOS ARCHIVOS ---
 MONGO_DATA_FILE = "data/mongo_data.json"
@@ -12,6 +19,14 @@ CASSANDRA_DATA_FILE = "data/cassandra_data.json"
 DGRAPH_SCHEMA_FILE = "Dgraph/schema.dql" 
 DGRAPH_DATA_FILE = "data/dgraph_data.rdf"
 
+parser = argparse.ArgumentParser(description="Pobla MongoDB, Cassandra y Dgraph con los archivos de data/.")
+parser.add_argument("--bulk", action="store_true", help="Carga masiva: lectura en streaming, escrituras paralelas y filas/s por base")
+parser.add_argument("--concurrency", type=int, default=100, help="Peticiones simultáneas a Cassandra (modo --bulk)")
+parser.add_argument("--chunk-size", type=int, default=5000, help="Documentos por insert_many / quads por transacción de Dgraph (modo --bulk)")
+parser.add_argument("--workers", type=int, default=8, help="Transacciones paralelas de Dgraph (modo --bulk)")
+parser.add_argument("--retries", type=int, default=5, help="Reintentos por transacción abortada de Dgraph (modo --bulk)")
+args = parser.parse_args()
+
 print("Iniciando el proceso de población de bases de datos...")
 
 # ###############################################################
@@ -23,9 +38,8 @@ try:
     mongo_db = mongo_client.learnlink
     mongo_client.server_info()
     print("MongoDB conectado.")
-
-    with open(MONGO_DATA_FILE, "r", encoding="utf-8") as f:
-        mongo_data = json.load(f)
+    # Después del corte a buckets (meta.activity_layout) ya no se llena course_activity.
+    load_layout(mongo_db)
 
     print("Limpiando colecciones...")
     mongo_db.users.delete_many({})
@@ -42,8 +56,10 @@ try:
 
     mongo_db.courses.create_index([("title", pymongo.TEXT), ("category", pymongo.TEXT)])
     mongo_db.courses.create_index([("course_uuid", pymongo.ASCENDING)], unique=True)
+    mongo_db.courses.create_index([("title", pymongo.ASCENDING)])
+    mongo_db.courses.create_index([("category", pymongo.ASCENDING), ("title", pymongo.ASCENDING)])
 
-    mongo_db.lessons.create_index([("title", pymongo.TEXT)])
+    ensure_lesson_indexes(mongo_db)
     mongo_db.lessons.create_index([("course_title", pymongo.ASCENDING)])
 
     mongo_db.enrollments.create_index([("user_email", pymongo.ASCENDING), ("course_title", pymongo.ASCENDING)], unique=True)
@@ -52,12 +68,18 @@ try:
     print("Índices creados.")
 
     print("Insertando datos en MongoDB...")
-    if "users" in mongo_data: mongo_db.users.insert_many(mongo_data["users"])
-    if "courses" in mongo_data: mongo_db.courses.insert_many(mongo_data["courses"])
-    if "lessons" in mongo_data: mongo_db.lessons.insert_many(mongo_data["lessons"])
-    if "enrollments" in mongo_data: mongo_db.enrollments.insert_many(mongo_data["enrollments"])
-    if "reviews" in mongo_data: mongo_db.reviews.insert_many(mongo_data["reviews"])
+    if args.bulk:
+        bulk_load.load_mongo(mongo_db, MONGO_DATA_FILE, args.chunk_size, transforms={"lessons": add_url_grams})
+    else:
+        with open(MONGO_DATA_FILE, "r", encoding="utf-8") as f:
+            mongo_data = json.load(f)
+        if "users" in mongo_data: mongo_db.users.insert_many(mongo_data["users"])
+        if "courses" in mongo_data: mongo_db.courses.insert_many(mongo_data["courses"])
+        if "lessons" in mongo_data: mongo_db.lessons.insert_many([add_url_grams(l) for l in mongo_data["lessons"]])
+        if "enrollments" in mongo_data: mongo_db.enrollments.insert_many(mongo_data["enrollments"])
+        if "reviews" in mongo_data: mongo_db.reviews.insert_many(mongo_data["reviews"])
 
+    bump_catalog_version(mongo_db)
     print("MongoDB: OK.")
 
 except Exception as e:
@@ -81,7 +103,8 @@ try:
 
     print("Recreando tablas en Cassandra...")
     
-    tablas = ["logs_by_user", "logs_by_role", "student_portfolio", "course_activity"]
+    tablas = ["logs_by_user", "user_events", "logs_by_role", "logs_by_role_day", "student_portfolio", "course_activity", "course_activity_by_bucket",
+              "course_enrollment_counts"]
     for t in tablas:
         try:
             session.execute(f"DROP TABLE IF EXISTS {t}")
@@ -101,15 +124,28 @@ try:
     """)
 
     session.execute("""
-        CREATE TABLE logs_by_role (
-            role TEXT,
+        CREATE TABLE user_events (
             email TEXT,
             action_date TIMESTAMP,
+            action TEXT,
+            user_id UUID,
             name TEXT,
+            role TEXT,
+            PRIMARY KEY ((email), action_date, action)
+        ) WITH CLUSTERING ORDER BY (action_date DESC, action ASC)
+    """)
+
+    session.execute("""
+        CREATE TABLE logs_by_role_day (
+            role TEXT,
+            day DATE,
+            action_date TIMESTAMP,
+            email TEXT,
             action TEXT,
+            name TEXT,
             user_id UUID,
-            PRIMARY KEY ((role), email, action_date, action)
-        ) WITH CLUSTERING ORDER BY (email ASC, action_date DESC, action ASC)
+            PRIMARY KEY ((role, day), action_date, email, action)
+        ) WITH CLUSTERING ORDER BY (action_date DESC, email ASC, action ASC)
     """)
 
     session.execute("""
@@ -138,34 +174,72 @@ try:
         )
     """)
 
-    with open(CASSANDRA_DATA_FILE, "r", encoding="utf-8") as f:
-        cassandra_data = json.load(f)
+    session.execute("""
+        CREATE TABLE course_activity_by_bucket (
+            course_title TEXT,
+            bucket INT,
+            status TEXT,
+            grade FLOAT,
+            email TEXT,
+            name TEXT,
+            course_id UUID,
+            user_id UUID,
+            PRIMARY KEY ((course_title, bucket), status, grade, email)
+        )
+    """)
+
+    session.execute("""
+        CREATE TABLE course_enrollment_counts (
+            course_title TEXT,
+            status TEXT,
+            students COUNTER,
+            PRIMARY KEY ((course_title), status)
+        )
+    """)
 
     print("Preparando inserts...")
     q_logs_user = session.prepare("INSERT INTO logs_by_user (email, action, action_date, user_id, name, role) VALUES (?, ?, ?, ?, ?, ?)")
-    q_logs_role = session.prepare("INSERT INTO logs_by_role (role, email, action_date, name, action, user_id) VALUES (?, ?, ?, ?, ?, ?)")
+    q_user_events = session.prepare("INSERT INTO user_events (email, action_date, action, user_id, name, role) VALUES (?, ?, ?, ?, ?, ?)")
+    q_logs_role = session.prepare("INSERT INTO logs_by_role_day (role, day, action_date, email, action, name, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)")
     q_student = session.prepare("INSERT INTO student_portfolio (email, status, course_title, grade, course_id, user_id, name) VALUES (?, ?, ?, ?, ?, ?, ?)")
-    q_course = session.prepare("INSERT INTO course_activity (course_title, status, grade, email, name, course_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)")
-
-    print("Insertando Logs...")
-    raw_logs = cassandra_data.get("logging_info_by_email", [])
-    for log in raw_logs:
-        role = log.get("role", "student")
-        uid = uuid.UUID(log["user_id"])
-        dt = datetime.fromisoformat(log["action_date"])
+    q_course = None
+    if writes_legacy():
+        q_course = session.prepare("INSERT INTO course_activity (course_title, status, grade, email, name, course_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)")
+    q_course_bucket = session.prepare("INSERT INTO course_activity_by_bucket (course_title, bucket, status, grade, email, name, course_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+    if args.bulk:
+        bulk_load.load_cassandra(session, CASSANDRA_DATA_FILE, q_logs_user, q_logs_role, q_student, q_course, q_course_bucket,
+                                 q_user_events, concurrency=args.concurrency)
+    else:
+        with open(CASSANDRA_DATA_FILE, "r", encoding="utf-8") as f:
+            cassandra_data = json.load(f)
+
+        print("Insertando Logs...")
+        raw_logs = cassandra_data.get("logging_info_by_email", [])
+        for log in raw_logs:
+            role = log.get("role", "student")
+            uid = uuid.UUID(log["user_id"])
+            dt = datetime.fromisoformat(log["action_date"])
         
-        session.execute(q_logs_user, (log["email"], log["action"], dt, uid, log["name"], role))
-        session.execute(q_logs_role, (role, log["email"], dt, log["name"], log["action"], uid))
-
-    print("Insertando Cursos...")
-    raw_courses = cassandra_data.get("course_info_by_status", [])
-    for c in raw_courses:
-        grade = float(c["grade"]) if c.get("grade") is not None else 0.0
-        uid = uuid.UUID(c["user_id"])
-        cid = uuid.UUID(c["course_id"])
+            session.execute(q_logs_user, (log["email"], log["action"], dt, uid, log["name"], role))
+            session.execute(q_logs_role, (role, dt.date(), dt, log["email"], log["action"], log["name"], uid))
+            session.execute(q_user_events, (log["email"], dt, log["action"], uid, log["name"], role))
+
+        print("Insertando Cursos...")
+        raw_courses = cassandra_data.get("course_info_by_status", [])
+        for c in raw_courses:
+            grade = float(c["grade"]) if c.get("grade") is not None else 0.0
+            uid = uuid.UUID(c["user_id"])
+            cid = uuid.UUID(c["course_id"])
         
-        session.execute(q_student, (c["email"], c["status"], c["course_title"], grade, cid, uid, c["name"]))
-        session.execute(q_course, (c["course_title"], c["status"], grade, c["email"], c["name"], cid, uid))
+            session.execute(q_student, (c["email"], c["status"], c["course_title"], grade, cid, uid, c["name"]))
+            if q_course is not None:
+                session.execute(q_course, (c["course_title"], c["status"], grade, c["email"], c["name"], cid, uid))
+            session.execute(q_course_bucket, (c["course_title"], activity_bucket(c["email"]), c["status"], grade, c["email"], c["name"], cid, uid))
+
+    # Contadores por curso y estado, calculados desde course_activity (o sus buckets después del corte).
+    courses, adjusted = reconcile(session)
+    print(f"Contadores de alumnos: {len(adjusted)} en {courses} cursos.")
 
     print("Cassandra: OK.")
 
@@ -192,17 +266,25 @@ try:
     client.alter(op_schema)
     print("Esquema Dgraph cargado.")
 
-    with open(DGRAPH_DATA_FILE, "r", encoding="utf-8") as f:
-        rdf_data = f.read()
-
-    txn = client.txn()
-    try:
-        txn.mutate(set_nquads=rdf_data, commit_now=True)
+    if args.bulk:
+        bulk_load.load_dgraph(client, DGRAPH_DATA_FILE, chunk_size=args.chunk_size, workers=args.workers, retries=args.retries)
         print("Dgraph: OK.")
-    except Exception as e:
-        print(f"Error insertando datos Dgraph: {e}")
-    finally:
-        txn.discard()
+    else:
+        with open(DGRAPH_DATA_FILE, "r", encoding="utf-8") as f:
+            rdf_data = f.read()
+
+        txn = client.txn()
+        try:
+            txn.mutate(set_nquads=rdf_data, commit_now=True)
+            print("Dgraph: OK.")
+        except Exception as e:
+            print(f"Error insertando datos Dgraph: {e}")
+        finally:
+            txn.discard()
+
+    # Contadores desnormalizados de Course (enrollment_count, review_count, rating_sum).
+    repaired = dgraph_repair_course_counters()
+    print(f"Contadores de cursos recalculados: {repaired}")
 
 except Exception as e:
     print(f"ERROR AL POBLAR DGRAPH: {e}")
@@ -0,0 +1,191 @@
+import csv
+import json
+import time
+import struct
+import argparse
+from itertools import islice
+
+from cassandra.query import BatchStatement, BatchType
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+
+from connect import connect_mongo, connect_cassandra
+from cql_registry import StatementRegistry
+from activity_buckets import activity_bucket, load_layout, writes_legacy
+from course_counters import record_status_change
+from bulk_load import report_throughput
+
+#################################################################
+# PUBLICACIÓN MASIVA DE CALIFICACIONES (active -> completed)
+#################################################################
+# Cada renglón (email, course_title, grade) mueve una inscripción de
+# 'active' a 'completed'. Como status y grade son columnas de clustering, la
+# transición es un DELETE + INSERT en student_portfolio (partición email),
+# course_activity (partición course_title, solo antes del corte a buckets) y
+# course_activity_by_bucket; las sentencias van en un batch LOGGED para que
+# las tablas nunca queden en desacuerdo. Los batches se envían con
+# concurrencia acotada.
+#
+# Es idempotente: antes de escribir se lee el portafolio de cada alumno (una
+# consulta por partición) y
+#   - 'active'                      -> transición + contador active->completed
+#   - 'completed' con la misma nota -> se omite
+#   - 'completed' con otra nota     -> se corrige la nota (sin tocar contadores;
+#                                      en student_portfolio es un upsert)
+#   - sin inscripción               -> se rechaza
+# El estado de la matrícula en Dgraph no se modifica aquí.
+
+POST_CHUNK_SIZE = 5000      # Renglones leídos por ronda (memoria acotada)
+POST_CONCURRENCY = 64       # Batches en vuelo
+MIN_GRADE = 0.0
+MAX_GRADE = 10.0
+
+
+class GradeRowError(ValueError):
+    """ Renglón de entrada inválido. """
+
+
+def parse_row(raw):
+    email = (raw.get("email") or "").strip()
+    course_title = (raw.get("course_title") or "").strip()
+    if not email or not course_title:
+        raise GradeRowError("faltan email o course_title")
+    try:
+        grade = float(raw.get("grade"))
+    except (TypeError, ValueError):
+        raise GradeRowError(f"calificación inválida: {raw.get('grade')!r}")
+    if not MIN_GRADE <= grade <= MAX_GRADE:
+        raise GradeRowError(f"calificación fuera de rango: {grade}")
+    return email, course_title, as_float32(grade)
+
+
+def as_float32(value):
+    """ grade es FLOAT (32 bits) en Cassandra: se redondea igual para comparar con lo guardado.
+
+    Además evita que una corrección con la "misma" nota borre y reinserte la
+    misma llave de clustering en un batch (el tombstone ganaría).
+    """
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def read_grades(path):
+    """ Renglones crudos de un CSV (con encabezado) o JSONL, en streaming. """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+class GradePoster:
+    def __init__(self, cass, concurrency=POST_CONCURRENCY):
+        self.cass = cass
+        self.concurrency = concurrency
+        self.stats = {"leídos": 0, "publicados": 0, "corregidos": 0, "omitidos": 0, "rechazados": 0, "errores": 0}
+
+    def _portfolios(self, emails):
+        """ {email: {course_title: fila}} leyendo una partición de student_portfolio por alumno, en paralelo. """
+        statement = self.cass.prepared["portfolio_by_student"]
+        results = execute_concurrent_with_args(self.cass.session, statement, [(e,) for e in emails],
+                                               concurrency=self.concurrency, raise_on_first_error=False)
+        portfolios = {}
+        for email, (ok, rows) in zip(emails, results):
+            portfolios[email] = {r.course_title: r for r in rows} if ok else None
+        return portfolios
+
+    def _batch(self, email, course_title, grade, current):
+        """ Batch LOGGED que deja la inscripción en 'completed' con `grade`. """
+        bucket = activity_bucket(email)
+        old_status, old_grade = current.status, current.grade
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        # En student_portfolio la nota no es parte de la llave: una corrección
+        # ('completed' -> 'completed') es solo un upsert. Borrar y reinsertar la
+        # misma llave en el batch dejaría ganar al tombstone (mismo timestamp).
+        if old_status != 'completed':
+            batch.add(self.cass.bind("portfolio_delete", (email, old_status, course_title)))
+        batch.add(self.cass.bind("portfolio_insert", (email, 'completed', course_title, grade,
+                                                      current.course_id, current.user_id, current.name)))
+        if writes_legacy():
+            batch.add(self.cass.bind("activity_delete", (course_title, old_status, old_grade, email)))
+            batch.add(self.cass.bind("activity_insert", (course_title, 'completed', grade, email, current.name,
+                                                         current.course_id, current.user_id)))
+        batch.add(self.cass.bind("activity_bucket_delete", (course_title, bucket, old_status, old_grade, email)))
+        batch.add(self.cass.bind("activity_bucket_insert", (course_title, bucket, 'completed', grade, email,
+                                                            current.name, current.course_id, current.user_id)))
+        return batch
+
+    def post_chunk(self, raw_rows):
+        # Último renglón gana si un (email, curso) se repite en la ronda.
+        grades = {}
+        for raw in raw_rows:
+            self.stats["leídos"] += 1
+            try:
+                email, course_title, grade = parse_row(raw)
+            except GradeRowError as e:
+                self.stats["rechazados"] += 1
+                print(f"  Rechazado {raw}: {e}")
+                continue
+            grades[(email, course_title)] = grade
+
+        portfolios = self._portfolios(sorted({email for email, _ in grades}))
+        batches, transitions = [], []
+        for (email, course_title), grade in grades.items():
+            portfolio = portfolios.get(email)
+            if portfolio is None:
+                self.stats["errores"] += 1
+                continue
+            current = portfolio.get(course_title)
+            if current is None:
+                self.stats["rechazados"] += 1
+                print(f"  Rechazado {email} / {course_title}: no está inscrito")
+                continue
+            if current.status == 'completed' and current.grade == grade:
+                self.stats["omitidos"] += 1
+                continue
+            batches.append((self._batch(email, course_title, grade, current), None))
+            transitions.append((course_title, current.status))
+
+        counters = []
+        results = execute_concurrent(self.cass.session, batches, concurrency=self.concurrency, raise_on_first_error=False)
+        for (course_title, old_status), (ok, _) in zip(transitions, results):
+            if not ok:
+                self.stats["errores"] += 1
+            elif old_status == 'completed':
+                self.stats["corregidos"] += 1
+            else:
+                self.stats["publicados"] += 1
+                counters.append(record_status_change(self.cass, course_title, old_status, 'completed'))
+        for future in counters:
+            try:
+                future.result()
+            except Exception:
+                pass        # Ya se avisó en el errback; course_counters.py lo corrige.
+
+    def run(self, rows, chunk_size=POST_CHUNK_SIZE):
+        started = time.perf_counter()
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            self.post_chunk(chunk)
+            written = self.stats["publicados"] + self.stats["corregidos"]
+            print(f"  {self.stats['leídos']} leídos, {written} escritos "
+                  f"({written / max(time.perf_counter() - started, 1e-9):,.0f}/s)", end="\r")
+        print()
+        report_throughput("Cassandra.calificaciones", self.stats["publicados"] + self.stats["corregidos"],
+                          started, self.stats["errores"])
+        return self.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publica calificaciones (CSV/JSONL con email, course_title, grade) en Cassandra.")
+    parser.add_argument("path", help="Archivo .csv (con encabezado) o .jsonl")
+    parser.add_argument("--concurrency", type=int, default=POST_CONCURRENCY, help="Batches simultáneos")
+    parser.add_argument("--chunk-size", type=int, default=POST_CHUNK_SIZE, help="Renglones por ronda")
+    args = parser.parse_args()
+
+    load_layout(connect_mongo())
+    poster = GradePoster(StatementRegistry(connect_cassandra()), args.concurrency)
+    stats = poster.run(read_grades(args.path), args.chunk_size)
+    print(" | ".join(f"{k}={v}" for k, v in stats.items()))
+    if stats["errores"]:
+        print("Hubo errores: volver a correr con el mismo archivo (los renglones ya publicados se omiten).")
@@ -0,0 +1,98 @@
+import numpy as np
+from dgraph_client import dgraph_run_batch
+
+#################################################################
+# AGREGADOS DE CALIFICACIONES (D10 / D12)
+#################################################################
+
+# Suma y conteo de ratings por curso y por instructor calculados en Dgraph:
+# la respuesta crece con el número de cursos, no con el número de reseñas.
+RATING_BLOCKS = [
+    """var(func: type(Course)) {
+      ~review_of { r as rating }
+      c_sum as sum(val(r))
+      c_n as count(~review_of)
+    }""",
+    """var(func: type(Instructor)) {
+      teaches { t_sum as val(c_sum) t_n as val(c_n) }
+      i_sum as sum(val(t_sum))
+      i_n as sum(val(t_n))
+    }""",
+    "c(func: type(Course)) { title category total: val(c_sum) resenas: val(c_n) }",
+    "i(func: type(Instructor)) { name total: val(i_sum) resenas: val(i_n) }",
+]
+
+STREAM_PAGE_SIZE = 500
+
+
+def _rows(items, key):
+    return [(x.get(key), x.get("category"), float(x.get("total", 0) or 0), int(x.get("resenas", 0) or 0)) for x in items]
+
+
+def fetch_rating_stats():
+    """ Regresa {'courses': [(titulo, categoria, suma, n)], 'instructors': [(nombre, None, suma, n)]} con una sola consulta. """
+    data = dgraph_run_batch(RATING_BLOCKS, best_effort=True)
+    if data is None:
+        return None
+    return {"courses": _rows(data.get("c", []), "title"), "instructors": _rows(data.get("i", []), "name")}
+
+
+def fetch_rating_stats_streamed(page_size=STREAM_PAGE_SIZE):
+    """ Respaldo sin agregación en el servidor: pagina los cursos y acumula con NumPy.
+
+    Solo se mantiene en memoria una página de ratings a la vez.
+    """
+    courses = []
+    inst_names = {}
+    inst_sum = {}
+    inst_n = {}
+    after = ""
+    while True:
+        page = dgraph_run_batch([
+            f"c(func: type(Course), first: {page_size}{after}) {{ uid title category ~teaches {{ uid name }} ~review_of {{ rating }} }}"
+        ], best_effort=True)
+        if page is None:
+            return None
+        items = page.get("c", [])
+        if not items:
+            break
+
+        # Índice de curso por rating -> bincount con pesos = suma por curso.
+        idx = np.fromiter((n for n, c in enumerate(items) for _ in c.get("~review_of", [])), dtype=np.int64)
+        vals = np.fromiter((float(r["rating"]) for c in items for r in c.get("~review_of", [])), dtype=np.float64)
+        sums = np.bincount(idx, weights=vals, minlength=len(items))
+        counts = np.bincount(idx, minlength=len(items))
+
+        for n, c in enumerate(items):
+            courses.append((c.get("title"), c.get("category"), float(sums[n]), int(counts[n])))
+            for inst in c.get("~teaches", []):
+                inst_names[inst["uid"]] = inst.get("name")
+                inst_sum[inst["uid"]] = inst_sum.get(inst["uid"], 0.0) + float(sums[n])
+                inst_n[inst["uid"]] = inst_n.get(inst["uid"], 0) + int(counts[n])
+
+        after = f", after: {items[-1]['uid']}"
+        if len(items) < page_size:
+            break
+
+    instructors = [(inst_names[u], None, inst_sum[u], inst_n[u]) for u in inst_names]
+    return {"courses": courses, "instructors": instructors}
+
+
+def get_rating_stats():
+    """ Agregación en Dgraph y, si falla, el cálculo paginado con NumPy. """
+    return fetch_rating_stats() or fetch_rating_stats_streamed()
+
+
+def average(total, n):
+    return total / n if n else 0
+
+
+def group_by_category(courses):
+    """ Promedio ponderado por categoría: [(categoria, promedio, n)] solo para categorías con reseñas. """
+    rated = [c for c in courses if c[1] and c[3]]
+    if not rated:
+        return []
+    cats, inverse = np.unique(np.array([c[1] for c in rated], dtype=object), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.array([c[2] for c in rated]), minlength=len(cats))
+    counts = np.bincount(inverse, weights=np.array([c[3] for c in rated]), minlength=len(cats))
+    return [(str(cats[k]), float(sums[k] / counts[k]), int(counts[k])) for k in range(len(cats))]
@@ -0,0 +1,95 @@
+import os
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+
+from tabulate import tabulate
+
+#################################################################
+# VISOR DE RESULTADOS PAGINADOS (CASSANDRA)
+#################################################################
+# Las fuentes son iteradores perezosos (StatementRegistry.iter_rows): las
+# filas llegan de `fetch_size` en `fetch_size` con el paging_state del
+# driver, así que "siguiente página" continúa donde se quedó la anterior en
+# vez de releer el resultado y en memoria solo vive la página que se
+# muestra. La exportación a CSV/JSONL vuelve a recorrer la consulta completa
+# y escribe fila por fila.
+
+VIEW_PAGE_SIZE = 20        # Filas por pantalla
+EXPORT_DIR = "data/exports"
+
+
+#################################################################
+# EXPORTACIÓN EN STREAMING
+#################################################################
+
+def export_rows(rows, path, headers, to_row):
+    """ Escribe `rows` (iterador) en CSV o JSONL según la extensión de `path`. Regresa filas escritas. """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for r in rows:
+                f.write(json.dumps(dict(zip(headers, to_row(r))), default=str, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for r in rows:
+                writer.writerow(to_row(r))
+                count += 1
+    return count
+
+
+def export_path(name, fmt):
+    return os.path.join(EXPORT_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}")
+
+
+class ResultView:
+    """ Muestra un resultado página por página con opción de exportarlo.
+
+    `source` es una función que regresa un iterador nuevo de filas (p. ej. un
+    generador sobre iter_rows); la vista lo consume de VIEW_PAGE_SIZE en
+    VIEW_PAGE_SIZE y la exportación pide uno nuevo para recorrer todo.
+    """
+
+    def __init__(self, source, headers, to_row, name="resultado", page_size=VIEW_PAGE_SIZE):
+        self.source = source
+        self.headers = headers
+        self.to_row = to_row
+        self.name = name
+        self.page_size = page_size
+
+    def _next_page(self, rows, carry):
+        """ Regresa (página, fila sobrante) leyendo una fila de más para saber si sigue algo. """
+        page = carry + list(islice(rows, self.page_size + 1 - len(carry)))
+        return page[:self.page_size], page[self.page_size:]
+
+    def export(self, fmt):
+        path = export_path(self.name, fmt)
+        count = export_rows(self.source(), path, self.headers, self.to_row)
+        print(f"\n{count} filas exportadas a {path}")
+
+    def show(self, empty_message="Sin resultados."):
+        """ Ciclo interactivo: Enter = siguiente página, c/j = exportar CSV/JSONL, q = salir. """
+        rows = iter(self.source())
+        carry = []
+        shown = 0
+        while True:
+            page, carry = self._next_page(rows, carry)
+            more = bool(carry)
+            if not page and not shown:
+                print(empty_message)
+                return
+            print(tabulate([self.to_row(r) for r in page], headers=self.headers, tablefmt="fancy_grid",
+                           showindex=range(shown + 1, shown + len(page) + 1)))
+            shown += len(page)
+            options = "Enter = siguiente página, " if more else ""
+            choice = input(f"\n{shown} filas mostradas{'' if more else ' (fin)'}. "
+                           f"{options}c = exportar CSV, j = exportar JSONL, q = salir: ").strip().lower()
+            if choice in ("c", "j"):
+                self.export("csv" if choice == "c" else "jsonl")
+                return
+            if choice == "q" or not more:
+                return
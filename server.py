@@ -0,0 +1,442 @@
+import json
+import time
+import asyncio
+import secrets
+import argparse
+import functools
+from datetime import date
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import service
+from service import ServiceError, NotFound
+from enrollment import EnrollmentError, DuplicateEnrollmentError
+from audit_log import get_audit_writer
+from lesson_search import search_lessons
+from metrics import set_action, propagate
+import activity_buckets
+from activity_buckets import ACTIVITY_BUCKETS, merge_bucket_rows
+
+#################################################################
+# SERVIDOR HTTP ASÍNCRONO SOBRE LA CAPA DE SERVICIOS
+#################################################################
+# Un solo proceso atiende muchas sesiones concurrentes: el loop de asyncio
+# nunca se bloquea. Las lecturas de Cassandra usan execute_async (puenteado
+# a futures de asyncio) y el resto de los servicios (pymongo y el pool HTTP
+# de Dgraph, ambos thread-safe) corren en un ThreadPoolExecutor acotado.
+
+SERVER_WORKERS = 64
+SESSION_HEADER = "Authorization"
+SESSION_TTL = 8 * 3600          # Vigencia de un token desde el login (segundos)
+SESSION_MAX = 100000            # Sesiones vivas como máximo (se expulsa la más antigua)
+HISTORY_LIMIT = 200
+REPORT_MAX_TOP = 100
+
+
+def _dumps(data):
+    return json.dumps(data, default=str, ensure_ascii=False)
+
+def ok(data, status=200):
+    return web.json_response(data, status=status, dumps=_dumps)
+
+def fail(message, status):
+    return web.json_response({"error": message}, status=status, dumps=_dumps)
+
+
+async def run_sync(request, fn, *args, **kwargs):
+    """ Ejecuta un servicio bloqueante en el pool del servidor. """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app["executor"], propagate(functools.partial(fn, *args, **kwargs)))
+
+async def run_cql(request, name, params):
+    """ Sentencia registrada con execute_async; regresa todas las filas sin bloquear el loop. """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    rows = []
+    response = request.app["cass"].run_async(name, params)
+
+    def on_page(page):
+        rows.extend(page)
+        if response.has_more_pages:
+            response.start_fetching_next_page()
+        else:
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(rows))
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(lambda: done.done() or done.set_exception(exc))
+
+    response.add_callbacks(on_page, on_error)
+    return await done
+
+async def run_cql_buckets(request, name, course_title, params=()):
+    """ Sentencia por bucket de course_activity_by_bucket: todos los buckets a la vez, una lista por bucket. """
+    return await asyncio.gather(*(run_cql(request, name, (course_title, bucket) + tuple(params))
+                                  for bucket in range(ACTIVITY_BUCKETS)))
+
+
+#################################################################
+# SESIONES
+#################################################################
+
+class SessionStore:
+    """ Tokens de sesión -> usuario, con caducidad y tamaño acotado.
+
+    Los tokens se guardan en orden de emisión: los vencidos se purgan desde el
+    inicio en cada login y, si se llega a `max_entries`, se expulsa el más
+    antiguo. Solo se usa desde el loop de asyncio, así que no necesita lock.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()    # token -> (usuario, emitido)
+
+    def _purge(self, now):
+        while self.entries:
+            _, issued = next(iter(self.entries.values()))
+            if now - issued < self.ttl and len(self.entries) < self.max_entries:
+                return
+            self.entries.popitem(last=False)
+
+    def add(self, token, user):
+        now = time.monotonic()
+        self._purge(now)
+        self.entries[token] = (user, now)
+
+    def get(self, token):
+        """ Usuario del token, o None si no existe o ya caducó. """
+        entry = self.entries.get(token)
+        if entry is None:
+            return None
+        user, issued = entry
+        if time.monotonic() - issued >= self.ttl:
+            del self.entries[token]
+            return None
+        return user
+
+    def pop(self, token):
+        return self.entries.pop(token, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def public_user(user):
+    return {k: user.get(k) for k in ("name", "email", "role", "user_uuid")}
+
+def current_user(request, *roles):
+    """ Usuario de la sesión (token Bearer); 401 sin sesión o caducada y 403 si su rol no está en `roles`. """
+    token = request.headers.get(SESSION_HEADER, "").removeprefix("Bearer ").strip()
+    user = request.app["sessions"].get(token)
+    if user is None:
+        raise web.HTTPUnauthorized(text=_dumps({"error": "Sesión no válida."}), content_type="application/json")
+    if roles and user.get("role") not in roles:
+        raise web.HTTPForbidden(text=_dumps({"error": "No tienes permiso para esta operación."}), content_type="application/json")
+    return user
+
+def bad_request(message):
+    return web.HTTPBadRequest(text=_dumps({"error": message}), content_type="application/json")
+
+def int_param(request, name, default, low=None, high=None):
+    """ Parámetro entero de la query, acotado a [low, high]; 400 si no es un entero. """
+    raw = request.query.get(name)
+    try:
+        value = default if raw in (None, "") else int(raw)
+    except ValueError:
+        raise bad_request(f"Parámetro '{name}' inválido: se esperaba un entero.")
+    if low is not None:
+        value = max(value, low)
+    if high is not None:
+        value = min(value, high)
+    return value
+
+def date_param(request, name):
+    """ Parámetro de fecha AAAA-MM-DD de la query (None si no viene); 400 si no es una fecha. """
+    raw = request.query.get(name)
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise bad_request(f"Parámetro '{name}' inválido: se esperaba una fecha AAAA-MM-DD.")
+
+async def body(request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise bad_request("JSON inválido.")
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    """ Traduce los errores de la capa de servicios a códigos HTTP y etiqueta las métricas con la ruta. """
+    resource = request.match_info.route.resource
+    set_action(f"{request.method} {resource.canonical if resource else request.path}")
+    try:
+        return await handler(request)
+    except NotFound as e:
+        return fail(str(e), 404)
+    except ServiceError as e:
+        return fail(str(e), 400)
+    except DuplicateEnrollmentError as e:
+        return fail(str(e), 409)
+    except EnrollmentError as e:
+        return fail(str(e), 502)
+
+
+async def login(request):
+    data = await body(request)
+    user = await run_sync(request, service.authenticate, request.app["mongo"], data.get("email", ""), data.get("password", ""))
+    if not user:
+        return fail("Email o contraseña incorrectos", 401)
+    token = secrets.token_urlsafe(24)
+    request.app["sessions"].add(token, user)
+    logged = service.start_session(user)
+    return ok({"token": token, "user": public_user(user), "audit_logged": logged})
+
+async def logout(request):
+    user = current_user(request)
+    request.app["sessions"].pop(request.headers[SESSION_HEADER].removeprefix("Bearer ").strip())
+    return ok({"audit_logged": service.end_session(user)})
+
+
+#################################################################
+# ALUMNO
+#################################################################
+
+async def my_enrollments(request):
+    user = current_user(request)
+    return ok(await run_sync(request, service.student_enrollments, request.app["mongo"], user["email"]))
+
+async def my_portfolio(request):
+    user = current_user(request)
+    status = request.query.get("status", "completed")
+    return ok(service.portfolio_rows(await run_cql(request, "portfolio_by_status", (user["email"], status))))
+
+def date_range(request, days):
+    """ ?from=&to= (AAAA-MM-DD); por omisión los últimos `days` días. """
+    return service.history_range(date_param(request, "from"), date_param(request, "to"), days)
+
+def history_limit(request):
+    return int_param(request, "limit", HISTORY_LIMIT, low=1, high=HISTORY_LIMIT * 5)
+
+async def my_history(request):
+    """ ?from=&to=&action=&limit=  Un solo slice de user_events, más recientes primero. """
+    user = current_user(request)
+    start, end = date_range(request, service.HISTORY_DAYS)
+    rows = service.session_history_stream(request.app["cass"], user["email"], start, end,
+                                          request.query.get("action"), history_limit(request))
+    return ok(await run_sync(request, list, rows))
+
+async def my_reviews(request):
+    user = current_user(request)
+    return ok(await run_sync(request, service.student_reviews, request.app["mongo"], user["name"]))
+
+async def enroll(request):
+    user = current_user(request, "student")
+    data = await body(request)
+    result = await run_sync(request, service.enroll, request.app["mongo"], request.app["cass"], user, data.get("course_title", ""))
+    return ok(result, status=201)
+
+async def review(request):
+    user = current_user(request, "student")
+    data = await body(request)
+    result = await run_sync(request, service.write_review, request.app["mongo"], user,
+                            data.get("course_title", ""), (data.get("comment") or "").strip(), data.get("rating"))
+    return ok(result, status=201)
+
+async def suggest(request):
+    current_user(request)
+    k = int_param(request, "k", 0, low=0) or None
+    return ok(await run_sync(request, service.suggest_courses, request.query.get("q", ""), k))
+
+
+#################################################################
+# INSTRUCTOR / ADMIN
+#################################################################
+
+async def instructor_courses(request):
+    user = current_user(request, "instructor")
+    return ok(await run_sync(request, service.instructor_courses, user["email"]))
+
+async def _owned_course(request):
+    user = current_user(request, "instructor", "admin")
+    title = request.match_info["title"]
+    if not await run_sync(request, service.owns_course, user, title):
+        return None
+    return title
+
+async def course_activity(request):
+    title = await _owned_course(request)
+    if title is None:
+        return fail("Curso no válido.", 403)
+    status = request.query.get("status", "completed")
+    if activity_buckets.is_bucketed():
+        rows = merge_bucket_rows(await run_cql_buckets(request, "activity_bucket_by_status", title, (status,)))
+    else:
+        rows = await run_cql(request, "activity_by_status", (title, status))
+    return ok(service.activity_rows(rows))
+
+async def course_failing(request):
+    title = await _owned_course(request)
+    if title is None:
+        return fail("Curso no válido.", 403)
+    if activity_buckets.is_bucketed():
+        rows = merge_bucket_rows(await run_cql_buckets(request, "activity_bucket_below_grade", title,
+                                                       ("completed", service.FAILING_GRADE)))
+    else:
+        rows = await run_cql(request, "activity_below_grade", (title, "completed", service.FAILING_GRADE))
+    return ok(service.activity_rows(rows))
+
+async def course_active_count(request):
+    title = await _owned_course(request)
+    if title is None:
+        return fail("Curso no válido.", 403)
+    rows = await run_cql(request, "course_count_get", (title, "active"))
+    return ok({"course_title": title, "active": rows[0].students if rows else 0})
+
+async def course_counts(request):
+    current_user(request, "admin")
+    return ok(await run_sync(request, service.course_enrollment_counts, request.app["cass"]))
+
+async def course_lesson_count(request):
+    current_user(request)
+    title = request.match_info["title"]
+    return ok({"course_title": title, "lessons": await run_sync(request, service.count_lessons, request.app["mongo"], title)})
+
+async def course_reviews(request):
+    current_user(request, "admin")
+    return ok(await run_sync(request, service.course_reviews, request.app["mongo"], request.match_info["title"]))
+
+async def users(request):
+    current_user(request, "admin")
+    return ok(await run_sync(request, service.users_by_role, request.app["mongo"], request.query.get("role")))
+
+async def logs(request):
+    current_user(request, "admin")
+    if request.query.get("email"):
+        start, end = date_range(request, service.HISTORY_DAYS)
+        rows = service.logs_by_user_stream(request.app["cass"], request.query["email"], start, end, history_limit(request))
+        return ok(await run_sync(request, list, rows))
+    if request.query.get("role"):
+        return await role_logs(request)
+    return fail("Indica ?role= o ?email=.", 400)
+
+async def role_logs(request):
+    """ ?role=&from=AAAA-MM-DD&to=AAAA-MM-DD&limit=&cursor=  Página de logs del rol, más recientes primero. """
+    q = request.query
+    start, end = date_range(request, 7)
+    limit = int_param(request, "limit", service.ROLE_LOG_PAGE, low=1, high=500)
+    cursor = None
+    if q.get("cursor"):
+        day, _, state = q["cursor"].partition(":")
+        try:
+            cursor = (date.fromisoformat(day), bytes.fromhex(state) if state else None)
+        except ValueError:
+            raise bad_request("Parámetro 'cursor' inválido.")
+    rows, cursor = await run_sync(request, service.logs_by_role, request.app["cass"], q["role"], start, end, limit, cursor)
+    next_cursor = f"{cursor[0].isoformat()}:{cursor[1].hex() if cursor[1] else ''}" if cursor else None
+    return ok({"logs": rows, "next": next_cursor})
+
+async def lessons(request):
+    current_user(request, "admin")
+    page = int_param(request, "page", 0, low=0)
+    rows, has_more = await run_sync(request, search_lessons, request.app["mongo"], request.query.get("q", ""), page)
+    return ok({"page": page, "has_more": has_more,
+               "lessons": [{"course_title": c, "title": t, "url": u, "score": s} for c, t, u, s in rows]})
+
+
+#################################################################
+# REPORTES DGRAPH
+#################################################################
+
+async def report(request):
+    """ GET /api/reports/D4?email=...  D4/D7/D8/D11 son del propio usuario; solo un admin puede pedir los de otro. """
+    user = current_user(request)
+    code = request.match_info["code"].upper()
+    q = request.query
+
+    if code in service.STUDENT_REPORTS:
+        if user.get("role") == "admin":
+            email = q.get("email", "")
+        elif q.get("email", user["email"]) != user["email"]:
+            return fail("No tienes permiso para esta operación.", 403)
+        else:
+            email = user["email"]
+        if not email:
+            return fail("Indica ?email= del alumno.", 400)
+        if code == "D8":
+            return ok(await run_sync(request, service.report_d8, email, q.get("after")))
+        return ok(await run_sync(request, service.STUDENT_REPORTS[code], email))
+
+    if user.get("role") != "admin":
+        return fail("No tienes permiso para esta operación.", 403)
+    if code == "D1":
+        return ok(await run_sync(request, service.report_d1, q.get("email", "")))
+    if code in ("D2", "D5"):
+        return ok(await run_sync(request, service.GLOBAL_REPORTS[code], int_param(request, "top", 20, low=1, high=REPORT_MAX_TOP)))
+    if code == "D9":
+        return ok(await run_sync(request, service.report_d9, int_param(request, "min_shared", 2, low=1),
+                                 int_param(request, "top", service.D9_TOP, low=1, high=REPORT_MAX_TOP)))
+    if code in service.GLOBAL_REPORTS:
+        return ok(await run_sync(request, service.GLOBAL_REPORTS[code]))
+    return fail(f"Reporte '{code}' no existe.", 404)
+
+
+async def health(request):
+    return ok({"sessions": len(request.app["sessions"]), "audit": get_audit_writer().stats()})
+
+
+#################################################################
+# ARRANQUE
+#################################################################
+
+def build_app(mongo, cass, workers=SERVER_WORKERS):
+    app = web.Application(middlewares=[error_middleware])
+    app["mongo"] = mongo
+    app["cass"] = cass
+    app["sessions"] = SessionStore()
+    app["executor"] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    async def shutdown(app):
+        get_audit_writer().flush()
+        app["executor"].shutdown(wait=False)
+
+    app.on_cleanup.append(shutdown)
+    app.add_routes([
+        web.post("/api/login", login),
+        web.post("/api/logout", logout),
+        web.get("/api/me/enrollments", my_enrollments),
+        web.get("/api/me/portfolio", my_portfolio),
+        web.get("/api/me/history", my_history),
+        web.get("/api/me/reviews", my_reviews),
+        web.post("/api/enrollments", enroll),
+        web.post("/api/reviews", review),
+        web.get("/api/courses/suggest", suggest),
+        web.get("/api/courses/counts", course_counts),
+        web.get("/api/instructor/courses", instructor_courses),
+        web.get("/api/courses/{title}/activity", course_activity),
+        web.get("/api/courses/{title}/failing", course_failing),
+        web.get("/api/courses/{title}/active-count", course_active_count),
+        web.get("/api/courses/{title}/lesson-count", course_lesson_count),
+        web.get("/api/courses/{title}/reviews", course_reviews),
+        web.get("/api/users", users),
+        web.get("/api/logs", logs),
+        web.get("/api/lessons", lessons),
+        web.get("/api/reports/{code}", report),
+        web.get("/api/health", health),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve las operaciones de LearnLink como API HTTP (asyncio).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Hilos para servicios bloqueantes (Mongo/Dgraph)")
+    args = parser.parse_args()
+
+    mongo_conn, cass_conn = service.start_backends(dgraph_pool_size=args.workers, enrollment_workers=args.workers)
+    web.run_app(build_app(mongo_conn, cass_conn, args.workers), host=args.host, port=args.port)
@@ -0,0 +1,570 @@
+import hashlib
+from itertools import islice
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from connect import connect_mongo, connect_cassandra, connect_dgraph_http
+from cql_registry import StatementRegistry
+from audit_log import AuditWriter, init_audit_writer, get_audit_writer
+from catalog import CatalogCache, init_catalog_cache, get_catalog_cache, CourseAutocomplete, init_autocomplete, get_autocomplete
+from dgraph_client import init_client
+from metrics import install_mongo_listener, PrometheusExporter
+from dgraph_client import dgraph_run_query, dgraph_insert_review, dql_escape
+from enrollment import run_enrollment, init_executor as init_enrollment_executor, ENROLLMENT_WORKERS
+import activity_buckets
+import course_counters
+from identity_map import IdentityMap, init_identity_map, resolve_user_uid, resolve_course_uid
+from rating_stats import get_rating_stats, group_by_category, average
+from similarity import pairwise_overlaps
+
+#################################################################
+# CAPA DE SERVICIOS (SIN input()/print())
+#################################################################
+# Cada operación recibe sus parámetros ya capturados y regresa datos planos
+# (listas de dicts). La terminal (main.py) y el servidor HTTP (server.py)
+# son clientes de esta capa. Los errores de negocio se reportan con
+# ServiceError, cuyo mensaje se puede mostrar tal cual al usuario.
+
+FAILING_GRADE = 6.0
+ROLE_LOG_PAGE = 50
+STREAM_FETCH_SIZE = 100     # Filas por viaje a Cassandra en las funciones *_stream
+HISTORY_DAYS = 30           # Rango por omisión del historial de sesión
+D8_MAX_FANOUT = 200     # Aristas máximas en cada nivel del recorrido de D8
+D8_PAGE_SIZE = 20
+D9_TOP = 100            # Pares devueltos por D9 (los que más cursos comparten)
+
+
+class ServiceError(Exception):
+    """ La operación no se pudo realizar; el mensaje es apto para el usuario. """
+
+
+class NotFound(ServiceError):
+    """ El usuario, curso o recurso solicitado no existe. """
+
+
+def hash_password(password):
+    """ Hashea una contraseña usando SHA-256. """
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _dgraph(query):
+    """ Consulta de reporte (best effort); ServiceError si Dgraph no responde. """
+    res = dgraph_run_query(query, best_effort=True)
+    if not res or "data" not in res:
+        raise ServiceError("No se recibieron datos de Dgraph.")
+    return res["data"]
+
+
+#################################################################
+# ARRANQUE
+#################################################################
+
+def start_backends(dgraph_pool_size=10, metrics_path="data/metrics.prom", enrollment_workers=ENROLLMENT_WORKERS):
+    """ Abre las conexiones y registra los componentes compartidos del proceso. Regresa (mongo, cass).
+
+    Las métricas por base se exportan a `metrics_path` (formato Prometheus) si se indica.
+    `enrollment_workers` = inscripciones que pueden correr a la vez (pool de enrollment.py).
+    """
+    install_mongo_listener()
+    mongo = connect_mongo()
+    cass = StatementRegistry(connect_cassandra())
+    init_audit_writer(AuditWriter(cass))
+    init_client(connect_dgraph_http(pool_size=dgraph_pool_size))
+    init_enrollment_executor(enrollment_workers)
+    init_identity_map(IdentityMap()).warm(mongo)
+    catalog = init_catalog_cache(CatalogCache(mongo))
+    catalog.reload()
+    catalog.start_change_stream()
+    init_autocomplete(CourseAutocomplete(mongo)).rebuild()
+    activity_buckets.load_layout(mongo)
+    if metrics_path:
+        PrometheusExporter(metrics_path).start()
+    return mongo, cass
+
+
+#################################################################
+# SESIÓN
+#################################################################
+
+def authenticate(mongo, email, password):
+    """ Regresa el documento del usuario o None si las credenciales no son válidas. """
+    user = mongo.users.find_one({"email": email, "password": hash_password(password)})
+    if not user:
+        user = mongo.users.find_one({"email": email, "password": password})
+    return user
+
+def start_session(user):
+    """ Encola el log_in. Regresa False si la cola de auditoría descartó el evento. """
+    return not user.get("user_uuid") or get_audit_writer().log(user, 'log_in')
+
+def end_session(user):
+    """ Encola el log_out. Regresa False si la cola de auditoría descartó el evento. """
+    return not user.get("user_uuid") or get_audit_writer().log(user, 'log_out')
+
+
+#################################################################
+# ALUMNO
+#################################################################
+
+def student_enrollments(mongo, email):
+    return [{"course_title": e["course_title"], "enroll_date": e["enroll_date"]}
+            for e in mongo.enrollments.find({"user_email": email}, {"_id": 0, "course_title": 1, "enroll_date": 1})]
+
+def portfolio_rows(rows):
+    return [{"course_title": r.course_title, "grade": r.grade} for r in rows]
+
+def student_portfolio(cass, email, status='completed'):
+    """ (C7/C8) Cursos del alumno en un estado ('completed' con calificación o 'active'). """
+    return portfolio_rows(cass.run("portfolio_by_status", (email, status)))
+
+def history_row(r):
+    return {"action": r.action, "action_date": r.action_date}
+
+def history_rows(rows):
+    return [history_row(r) for r in rows]
+
+def session_history(cass, email, action=None):
+    """ (C4/C5) Logs de sesión del usuario, opcionalmente solo 'log_in' o 'log_out'. """
+    if action in ('log_in', 'log_out'):
+        return history_rows(cass.run("logs_by_user_action", (email, action)))
+    return history_rows(cass.run("logs_by_user", (email,)))
+
+def history_range(start=None, end=None, days=HISTORY_DAYS):
+    """ Completa un rango de días: `end` = hoy y `start` = `days` días antes si no se indican. """
+    end = end or datetime.now().date()
+    return start or end - timedelta(days=days - 1), end
+
+def _user_events(cass, email, start, end, action, limit, fetch_size):
+    """ Slice [start, end] de la partición del usuario en user_events, del más reciente al más antiguo.
+
+    `action` se filtra en el cliente (es columna, no parte del rango) y `limit`
+    corta el stream sin pedir más páginas de las necesarias. Solo `limit=None`
+    significa sin límite; un valor menor que 1 se toma como 1.
+    """
+    if limit is not None:
+        limit = max(limit, 1)
+        fetch_size = min(fetch_size, limit)
+    since = datetime.combine(start, datetime.min.time())
+    until = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    rows = cass.iter_rows("user_events_between", (email, since, until), fetch_size)
+    if action in ('log_in', 'log_out'):
+        rows = (r for r in rows if r.action == action)
+    return rows if limit is None else islice(rows, limit)
+
+def session_history_stream(cass, email, start, end, action=None, limit=None, fetch_size=STREAM_FETCH_SIZE):
+    """ (C4/C5) Historial de sesión entre dos días (inclusive), como generador paginado. """
+    return map(history_row, _user_events(cass, email, start, end, action, limit, fetch_size))
+
+def enroll(mongo, cass, user, course_title):
+    """ (M4) Inscribe al alumno; lanza NotFound o EnrollmentError/DuplicateEnrollmentError. """
+    if not user.get("user_uuid"):
+        raise ServiceError("Tu cuenta de usuario no tiene un UUID.")
+    course = get_catalog_cache().get(course_title)
+    if not course:
+        raise NotFound("No se encontró ese curso.")
+    enroll_date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    result = {"course_title": course_title, "enroll_date": enroll_date}
+    if run_enrollment(mongo, cass, user, course_title, course.get("course_uuid"), enroll_date) is None:
+        result["warning"] = "Usuario o curso no encontrado en Dgraph: la inscripción no aparecerá en los reportes."
+    return result
+
+def was_enrolled(mongo, email, course_title):
+    return mongo.enrollments.find_one({"user_email": email, "course_title": course_title}, {"_id": 1}) is not None
+
+def write_review(mongo, user, course_title, comment, rating):
+    """ (M5) Registra la reseña en Mongo y en Dgraph. """
+    if not was_enrolled(mongo, user["email"], course_title):
+        raise ServiceError("No puedes escribir una reseña de un curso al que no estás inscrito.")
+    if not comment:
+        raise ServiceError("El comentario no puede estar vacío.")
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        raise ServiceError("Rating inválido.")
+    if rating < 1 or rating > 10:
+        raise ServiceError("Rating inválido.")
+
+    review_doc = {"_id": ObjectId(), "course_title": course_title, "username": user['name'],
+                  "comment": comment, "rating": rating}
+    mongo.reviews.insert_one(review_doc)
+
+    user_uid = resolve_user_uid(user["email"])
+    course_uid = resolve_course_uid(course_title)
+    if user_uid and course_uid and not dgraph_insert_review(comment, rating, user_uid, course_uid):
+        # Compensación: sin la reseña en Dgraph, D2/D5 no la verían.
+        mongo.reviews.delete_one({"_id": review_doc["_id"]})
+        raise ServiceError("No se pudo registrar la reseña en Dgraph; intenta de nuevo.")
+    return {"course_title": course_title, "comment": comment, "rating": rating}
+
+def student_reviews(mongo, name):
+    return list(mongo.reviews.find({"username": name}, {"_id": 0, "course_title": 1, "comment": 1, "rating": 1}))
+
+def suggest_courses(text, k=None):
+    """ Autocompletado de títulos de curso. """
+    completer = get_autocomplete()
+    return completer.complete(text, k) if completer else []
+
+
+#################################################################
+# INSTRUCTOR / ADMIN
+#################################################################
+
+def instructor_courses(email):
+    return [{"title": c["title"], "category": c.get("category", "")} for c in get_catalog_cache().courses_of(email)]
+
+def owns_course(user, course_title):
+    """ True si el usuario es admin o imparte el curso. """
+    if user.get("role") == "admin":
+        return True
+    course = get_catalog_cache().get(course_title)
+    return bool(course) and course.get("instructor_email") == user["email"]
+
+def activity_row(r):
+    return {"name": r.name, "email": r.email, "grade": r.grade}
+
+def activity_rows(rows):
+    return [activity_row(r) for r in rows]
+
+def course_activity(cass, course_title, status='completed'):
+    """ (C6/C11) Alumnos de un curso en un estado, con su calificación. """
+    if activity_buckets.is_bucketed():
+        return activity_rows(activity_buckets.bucketed_activity(cass, course_title, status))
+    return activity_rows(cass.run("activity_by_status", (course_title, status)))
+
+def course_activity_stream(cass, course_title, status='completed', fetch_size=STREAM_FETCH_SIZE):
+    """ Igual que course_activity pero como generador paginado (mezclando buckets si aplica). """
+    if activity_buckets.is_bucketed():
+        rows = activity_buckets.iter_bucketed(cass, "activity_bucket_by_status", course_title, (status,), fetch_size)
+    else:
+        rows = cass.iter_rows("activity_by_status", (course_title, status), fetch_size)
+    return map(activity_row, rows)
+
+def failing_students(cass, course_title, threshold=FAILING_GRADE):
+    """ (C9) Alumnos con calificación menor a `threshold`. """
+    if activity_buckets.is_bucketed():
+        return activity_rows(activity_buckets.bucketed_below_grade(cass, course_title, 'completed', threshold))
+    return activity_rows(cass.run("activity_below_grade", (course_title, 'completed', threshold)))
+
+def count_active_students(cass, course_title, exact=False):
+    """ (C10) Lee el contador del curso; `exact` hace el COUNT(*) sobre course_activity. """
+    if not exact:
+        return course_counters.course_count(cass, course_title, 'active')
+    if activity_buckets.is_bucketed():
+        return activity_buckets.bucketed_count(cass, course_title, 'active')
+    return cass.run("activity_count", (course_title, 'active')).one()[0]
+
+def course_enrollment_counts(cass):
+    """ Alumnos activos y terminados de todos los cursos (contadores), ordenados por activos. """
+    rows = [{"course_title": title, "active": c.get("active", 0), "completed": c.get("completed", 0)}
+            for title, c in course_counters.all_course_counts(cass).items()]
+    return sorted(rows, key=lambda r: (-r["active"], r["course_title"]))
+
+def count_lessons(mongo, course_title):
+    """ (M12) """
+    return mongo.lessons.count_documents({"course_title": course_title})
+
+def course_reviews(mongo, course_title):
+    """ (M6) """
+    return list(mongo.reviews.find({"course_title": course_title}, {"_id": 0, "username": 1, "rating": 1, "comment": 1}))
+
+def users_by_role(mongo, role=None):
+    """ (M7) """
+    return list(mongo.users.find({"role": role} if role else {}, {"_id": 0, "name": 1, "email": 1, "role": 1}))
+
+def role_log_rows(rows):
+    return [{"email": r.email, "name": r.name, "action": r.action, "action_date": r.action_date} for r in rows]
+
+def logs_by_role(cass, role, start, end, limit=ROLE_LOG_PAGE, cursor=None):
+    """ (C2) Logs de un rol entre los días `start` y `end` (inclusive), del más reciente al más antiguo.
+
+    Recorre las particiones (role, día) desde `end` hacia atrás pidiendo solo
+    las filas que faltan para llenar `limit`. Regresa (filas, cursor); el
+    cursor (día, paging_state) continúa donde se quedó la página, o es None
+    si ya no hay más días.
+    """
+    day, state = cursor or (end, None)
+    rows = []
+    while day >= start and len(rows) < limit:
+        page, state = cass.run_page("logs_by_role_day", (role, day), limit - len(rows), state)
+        rows.extend(page)
+        if state is None:
+            day -= timedelta(days=1)
+    return role_log_rows(rows), ((day, state) if day >= start else None)
+
+def user_log_row(r):
+    return {"email": r.email, "action": r.action, "action_date": r.action_date}
+
+def user_log_rows(rows):
+    return [user_log_row(r) for r in rows]
+
+def logs_by_user(cass, email):
+    """ (C3) """
+    return user_log_rows(cass.run("logs_by_user", (email,)))
+
+def logs_by_user_stream(cass, email, start, end, limit=None, fetch_size=STREAM_FETCH_SIZE):
+    """ (C3) Logs del usuario entre dos días (inclusive), como generador paginado. """
+    return map(user_log_row, _user_events(cass, email, start, end, None, limit, fetch_size))
+
+
+#################################################################
+# REPORTES DGRAPH (D1-D12)
+#################################################################
+
+def list_instructors():
+    return _dgraph("{ i(func: type(Instructor)) { name email } }").get("i", [])
+
+def list_students():
+    return _dgraph("{ s(func: type(User)) { name email } }").get("s", [])
+
+def _student_uid(email):
+    uid = resolve_user_uid(email)
+    if not uid:
+        raise NotFound("Usuario no encontrado.")
+    return uid
+
+def report_d1(email):
+    """ Instructor, sus cursos y los alumnos inscritos en cada uno. """
+    data = _dgraph(f"""{{
+      inst(func: eq(email, "{dql_escape(email)}")) @filter(type(Instructor)) {{
+        name
+        teaches {{
+          title
+          ~of_course {{
+            ~enrolled_in {{ name email }}
+          }}
+        }}
+      }}
+    }}""")
+    if not data.get("inst"):
+        raise NotFound("Instructor no encontrado.")
+    inst = data["inst"][0]
+    courses = [{"title": c["title"],
+                "students": [{"name": s["name"], "email": s["email"]}
+                             for e in c.get("~of_course", []) for s in e.get("~enrolled_in", [])]}
+               for c in inst.get("teaches", [])]
+    return {"name": inst["name"], "courses": courses}
+
+def report_d2(top_n=20):
+    """ Cursos con más inscripciones (contadores indexados de Course). """
+    data = _dgraph(f"""{{
+      c(func: type(Course), orderdesc: enrollment_count, first: {int(top_n)}) {{
+        title
+        enrollment_count
+        review_count
+      }}
+    }}""")
+    return [{"title": c["title"], "enrollments": c.get("enrollment_count", 0), "reviews": c.get("review_count", 0)}
+            for c in data.get("c", [])]
+
+def report_d3():
+    """ Pares de instructores que comparten alumnos y/o categorías. """
+    data = _dgraph("""{
+      i(func: type(Instructor)) {
+        uid
+        name
+        teaches {
+          category
+          ~of_course { ~enrolled_in { uid } }
+        }
+      }
+    }""")
+    names = {}
+    students_by_inst = {}
+    cats_by_inst = {}
+    for i in data.get("i", []):
+        names[i['uid']] = i['name']
+        students_by_inst[i['uid']] = [stu['uid'] for c in i.get('teaches', [])
+                                      for e in c.get('~of_course', []) for stu in e.get('~enrolled_in', [])]
+        cats_by_inst[i['uid']] = [c['category'] for c in i.get('teaches', []) if 'category' in c]
+
+    # Solo se generan los pares que sí comparten alumnos o categorías.
+    common_students = {(a, b): n for a, b, n in pairwise_overlaps(students_by_inst, min_shared=1)}
+    common_cats = {(a, b): sorted(set(cats_by_inst[a]) & set(cats_by_inst[b]))
+                   for a, b, _ in pairwise_overlaps(cats_by_inst, min_shared=1)}
+
+    return [{"a": names[key[0]], "b": names[key[1]],
+             "students": common_students.get(key, 0), "categories": common_cats.get(key, [])}
+            for key in sorted(set(common_students) | set(common_cats), key=lambda k: -common_students.get(k, 0))]
+
+def report_d4(email):
+    """ Cursos no tomados de las categorías o instructores del alumno. """
+    uid = _student_uid(email)
+    data = _dgraph(f"""{{
+      u(func: uid({uid})) {{
+        enrolled_in {{
+          of_course {{
+            uid
+            category
+            ~teaches {{ uid }}
+          }}
+        }}
+      }}
+    }}""")
+    taken_uids = set()
+    fav_cats = set()
+    fav_inst_uids = set()
+    for e in (data.get("u") or [{}])[0].get('enrolled_in', []):
+        c = e.get('of_course')
+        if c:
+            taken_uids.add(c['uid'])
+            if 'category' in c: fav_cats.add(c['category'])
+            for inst in c.get('~teaches', []):
+                fav_inst_uids.add(inst['uid'])
+
+    if not fav_cats and not fav_inst_uids:
+        raise ServiceError("El usuario no ha tomado cursos suficientes para recomendar.")
+
+    cat_block = " OR ".join([f'eq(category, "{dql_escape(c)}")' for c in fav_cats]) if fav_cats else "eq(val(0), 1)"
+    res = _dgraph(f"""{{
+      by_cat(func: type(Course)) @filter({cat_block} AND NOT uid({", ".join(taken_uids)})) {{
+        title
+        category
+      }}
+      by_inst(func: uid({", ".join(fav_inst_uids)})) {{
+        teaches @filter(NOT uid({", ".join(taken_uids)})) {{
+          title
+          category
+        }}
+      }}
+    }}""")
+    recommendations = [{"title": c['title'], "category": c['category'], "reason": "Misma Categoría"}
+                       for c in res.get('by_cat', [])]
+    seen = {r["title"] for r in recommendations}
+    for i in res.get('by_inst', []):
+        for c in i.get('teaches', []):
+            if c['title'] not in seen:
+                seen.add(c['title'])
+                recommendations.append({"title": c['title'], "category": c['category'], "reason": "Mismo Instructor"})
+    return recommendations
+
+def report_d5(top_n=20):
+    """ Instructores con más alumnos (suma de enrollment_count de sus cursos). """
+    data = _dgraph(f"""{{
+      var(func: type(Instructor)) {{
+        teaches {{ e as enrollment_count }}
+        total as sum(val(e))
+      }}
+      i(func: uid(total), orderdesc: val(total), first: {int(top_n)}) {{
+        name
+        total: val(total)
+      }}
+    }}""")
+    return [{"name": i['name'], "total": i.get('total', 0)} for i in data.get('i', [])]
+
+def report_d6():
+    """ Alumnos con 2+ cursos de la misma categoría o del mismo instructor. """
+    data = _dgraph("""{
+      u(func: type(User)) {
+        name
+        enrolled_in {
+          of_course {
+            category
+            ~teaches { name }
+          }
+        }
+      }
+    }""")
+    rows = []
+    for u in data.get('u', []):
+        user_name = u.get('name', 'Desconocido')
+        cat_counts = {}
+        inst_counts = {}
+        for e in u.get('enrolled_in', []):
+            course = e.get('of_course', {})
+            cat = course.get('category')
+            if cat: cat_counts[cat] = cat_counts.get(cat, 0) + 1
+            for inst in course.get('~teaches', []):
+                inst_name = inst.get('name')
+                if inst_name: inst_counts[inst_name] = inst_counts.get(inst_name, 0) + 1
+
+        rows += [{"student": user_name, "kind": "Categoría", "value": k, "courses": n} for k, n in cat_counts.items() if n > 1]
+        rows += [{"student": user_name, "kind": "Instructor", "value": k, "courses": n} for k, n in inst_counts.items() if n > 1]
+    rows.sort(key=lambda r: r["student"])
+    return rows
+
+def report_d7(email):
+    """ Cursos tomados por categoría. """
+    uid = _student_uid(email)
+    data = _dgraph(f"{{ u(func: uid({uid})) {{ enrolled_in {{ of_course {{ category }} }} }} }}")
+    cats = {}
+    for e in (data.get("u") or [{}])[0].get('enrolled_in', []):
+        c = e.get('of_course', {}).get('category')
+        if c: cats[c] = cats.get(c, 0) + 1
+    return [{"category": k, "total": v} for k, v in cats.items()]
+
+def report_d8(email, after=None, page_size=D8_PAGE_SIZE):
+    """ Una página de compañeros de red (alumnos de los instructores del alumno).
+
+    Deduplicación en el servidor (variables uid), límite de abanico por nivel y
+    paginación por cursor `after`. Regresa {'total', 'peers', 'next'}; `next`
+    es el cursor de la siguiente página o None.
+    """
+    uid = _student_uid(email)
+    cursor = f", after: {after}" if after else ""
+    data = _dgraph(f"""{{
+      var(func: uid({uid})) {{
+        enrolled_in (first: {D8_MAX_FANOUT}) {{ of_course {{ ~teaches (first: {D8_MAX_FANOUT}) {{ inst as uid }} }} }}
+      }}
+      var(func: uid(inst)) {{
+        teaches (first: {D8_MAX_FANOUT}) {{
+          ~of_course (first: {D8_MAX_FANOUT}) {{
+            ~enrolled_in (first: {D8_MAX_FANOUT}) @filter(NOT uid({uid})) {{ peers as uid }}
+          }}
+        }}
+      }}
+      total(func: uid(peers)) {{ count(uid) }}
+      p(func: uid(peers), first: {int(page_size)}{cursor}) {{ uid name email }}
+    }}""")
+    total = (data.get('total') or [{}])[0].get('count', 0)
+    peers = data.get('p', [])
+    more = len(peers) == page_size
+    return {"total": total, "peers": [{"name": p.get("name"), "email": p.get("email", "")} for p in peers],
+            "next": peers[-1]["uid"] if peers and more else None}
+
+def report_d9(min_shared=2, top_n=D9_TOP):
+    """ Los `top_n` pares de alumnos con más cursos en común (al menos `min_shared`). """
+    data = _dgraph("{ u(func: type(User)) { uid name enrolled_in { of_course { uid } } } }")
+    users = data.get('u', [])
+    names = {u['uid']: u['name'] for u in users}
+    user_courses = {u['uid']: [e['of_course']['uid'] for e in u.get('enrolled_in', []) if 'of_course' in e] for u in users}
+    return [{"a": names[a], "b": names[b], "shared": n} for a, b, n in pairwise_overlaps(user_courses, min_shared=min_shared, top_k=top_n)]
+
+def report_d10():
+    """ Promedio de reseñas por curso y por instructor. """
+    stats = get_rating_stats()
+    if not stats:
+        raise ServiceError("No se recibieron datos de Dgraph.")
+    return {
+        "courses": [{"title": t, "average": average(s, n), "reviews": n} for t, _, s, n in stats['courses']],
+        "instructors": [{"name": i, "average": average(s, n), "reviews": n} for i, _, s, n in stats['instructors']],
+    }
+
+def report_d11(email):
+    """ Cursos tomados por el alumno y sus instructores. """
+    uid = _student_uid(email)
+    data = _dgraph(f"""{{
+      u(func: uid({uid})) {{
+        enrolled_in {{
+          of_course {{
+            title
+            ~teaches {{ name }}
+          }}
+        }}
+      }}
+    }}""")
+    return [{"course": e.get('of_course', {}).get('title'),
+             "instructors": [i['name'] for i in e.get('of_course', {}).get('~teaches', [])]}
+            for e in (data.get("u") or [{}])[0].get('enrolled_in', [])]
+
+def report_d12():
+    """ Rating promedio ponderado por categoría. """
+    stats = get_rating_stats()
+    if not stats:
+        raise ServiceError("No se recibieron datos de Dgraph.")
+    return [{"category": c, "average": avg, "reviews": n} for c, avg, n in group_by_category(stats['courses'])]
+
+
+# Reportes que reciben el email de un alumno (un alumno solo puede pedir los suyos).
+STUDENT_REPORTS = {"D4": report_d4, "D7": report_d7, "D8": report_d8, "D11": report_d11}
+GLOBAL_REPORTS = {"D2": report_d2, "D3": report_d3, "D5": report_d5, "D6": report_d6,
+                  "D9": report_d9, "D10": report_d10, "D12": report_d12}
@@ -0,0 +1,77 @@
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+
+try:
+    import scipy.sparse as sparse
+except ImportError:     # Sin SciPy se usa el conteo por listas invertidas
+    sparse = None
+
+#################################################################
+# MOTOR DE CO-OCURRENCIA (PARES CON ELEMENTOS EN COMÚN)
+#################################################################
+
+
+def _dense_ids(memberships):
+    """ Asigna ids enteros densos a entidades y elementos; regresa (entidades, filas, columnas). """
+    entities = list(memberships)
+    item_ids = {}
+    rows, cols = [], []
+    for e_idx, entity in enumerate(entities):
+        for item in set(memberships[entity]):
+            rows.append(e_idx)
+            cols.append(item_ids.setdefault(item, len(item_ids)))
+    return entities, np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), len(item_ids)
+
+
+def _overlaps_sparse(n_entities, n_items, rows, cols):
+    """ Producto A·Aᵀ de la matriz de incidencia; solo el triángulo superior (a < b). """
+    a = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_entities, n_items))
+    shared = sparse.triu(a @ a.T, k=1).tocoo()
+    return shared.row, shared.col, shared.data
+
+
+def _overlaps_inverted(rows, cols):
+    """ Conteo por listas invertidas: por cada elemento, se suman todos los pares de sus entidades. """
+    order = np.lexsort((rows, cols))
+    rows, cols = rows[order], cols[order]
+    bounds = np.flatnonzero(np.diff(cols)) + 1
+    counts = Counter()
+    for members in np.split(rows, bounds):
+        if len(members) > 1:
+            counts.update(combinations(members.tolist(), 2))
+    if not counts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    pairs = np.fromiter((x for pair in counts for x in pair), dtype=np.int64, count=2 * len(counts)).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1], np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+
+
+def pairwise_overlaps(memberships, min_shared=1, top_k=None):
+    """ Pares de entidades que comparten al menos `min_shared` elementos.
+
+    `memberships` mapea entidad -> elementos (p. ej. instructor -> alumnos o
+    alumno -> cursos). Nunca se recorren los pares sin elementos en común:
+    con SciPy se usa el producto disperso A·Aᵀ y sin SciPy el conteo por
+    listas invertidas. Regresa [(entidad_a, entidad_b, compartidos)] ordenado
+    de mayor a menor, limitado a `top_k` si se indica.
+    """
+    entities, rows, cols, n_items = _dense_ids(memberships)
+    if len(rows) == 0:
+        return []
+
+    if sparse is not None:
+        a_idx, b_idx, shared = _overlaps_sparse(len(entities), n_items, rows, cols)
+    else:
+        a_idx, b_idx, shared = _overlaps_inverted(rows, cols)
+
+    keep = shared >= min_shared
+    a_idx, b_idx, shared = a_idx[keep], b_idx[keep], shared[keep]
+
+    if top_k is not None and len(shared) > top_k:
+        best = np.argpartition(-shared, top_k - 1)[:top_k]
+        a_idx, b_idx, shared = a_idx[best], b_idx[best], shared[best]
+
+    order = np.lexsort((b_idx, a_idx, -shared))
+    return [(entities[a_idx[i]], entities[b_idx[i]], int(shared[i])) for i in order]
@@ -0,0 +1,75 @@
+from collections import namedtuple
+
+import post_grades
+
+PortfolioRow = namedtuple("PortfolioRow", "status course_title grade course_id user_id name")
+
+
+class FakeBatch(list):
+    def __init__(self, batch_type=None):
+        super().__init__()
+
+    def add(self, statement):
+        self.append(statement)
+
+
+class FakeCassandra:
+    """ student_portfolio en memoria con la semántica de un batch: todas las
+    sentencias llevan el mismo timestamp y, a igual timestamp, el DELETE gana. """
+
+    session = None
+    prepared = {"portfolio_by_student": None}
+
+    def __init__(self):
+        self.portfolio = {}     # (email, status, course_title) -> grade
+
+    def bind(self, name, params):
+        return name, params
+
+    def rows_of(self, email):
+        return [PortfolioRow(status, title, grade, 1, 2, "Alumno")
+                for (e, status, title), grade in self.portfolio.items() if e == email]
+
+    def apply(self, batch):
+        deleted, inserted = set(), {}
+        for name, params in batch:
+            if name == "portfolio_delete":
+                deleted.add(params)
+            elif name == "portfolio_insert":
+                inserted[params[:3]] = params[3]
+        for key in deleted:
+            self.portfolio.pop(key, None)
+        for key, grade in inserted.items():
+            if key not in deleted:
+                self.portfolio[key] = grade
+
+
+def install(monkeypatch, cass):
+    monkeypatch.setattr(post_grades, "BatchStatement", FakeBatch)
+    monkeypatch.setattr(post_grades, "execute_concurrent_with_args",
+                        lambda session, statement, args, **kw: [(True, cass.rows_of(a[0])) for a in args])
+
+    def execute(session, batches, **kw):
+        for batch, _ in batches:
+            cass.apply(batch)
+        return [(True, None)] * len(batches)
+
+    monkeypatch.setattr(post_grades, "execute_concurrent", execute)
+    monkeypatch.setattr(post_grades, "record_status_change", lambda *args: None)
+
+
+def test_correction_keeps_portfolio_row(monkeypatch):
+    cass = FakeCassandra()
+    cass.portfolio[("ana@x.mx", "active", "Bases de Datos")] = 0.0
+    install(monkeypatch, cass)
+
+    first = post_grades.GradePoster(cass).run([{"email": "ana@x.mx", "course_title": "Bases de Datos", "grade": "7.5"}])
+    assert first["publicados"] == 1
+    assert cass.portfolio == {("ana@x.mx", "completed", "Bases de Datos"): 7.5}
+
+    second = post_grades.GradePoster(cass).run([{"email": "ana@x.mx", "course_title": "Bases de Datos", "grade": "9"}])
+    assert second["corregidos"] == 1
+    assert cass.portfolio == {("ana@x.mx", "completed", "Bases de Datos"): 9.0}
+
+    again = post_grades.GradePoster(cass).run([{"email": "ana@x.mx", "course_title": "Bases de Datos", "grade": "9"}])
+    assert again["omitidos"] == 1 and again["rechazados"] == 0